@@ -5,33 +5,73 @@ Supports chat, OCR, voice, and WhatsApp integration
 """
 import os
 import io
+import json
+import time
+import asyncio
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse,PlainTextResponse
+from fastapi.responses import StreamingResponse,PlainTextResponse,Response
 from pydantic import BaseModel 
 from dotenv import load_dotenv
-from typing import Optional
+from typing import List, Optional, Tuple
 from twilio.twiml.messaging_response import MessagingResponse
 # Import your handler classes
 from chat_handler import ChatHandler
-from ocr_handler import OCRHandler
+from ocr_handler import OCRHandler, expand_images
 from voice_handler import VoiceHandler
-from supabase_client import supabase
 from database_service import DatabaseService
+from llm_client import LLMClient
+from shared_cache import SharedCache
+from gazetteer import Gazetteer
+from uploads import UploadLimitMiddleware, upload_buffer, upload_limits
+from whatsapp_dispatcher import WhatsAppDispatcher, BUSY_REPLY, ERROR_REPLY
+import metrics
+from metrics import CacheCollector, MetricsMiddleware, timed
 
 # Load environment variables
 load_dotenv()
 
-chat_handler  = ChatHandler()
+shared_cache  = SharedCache.from_env()
+llm_client    = LLMClient()
+db_service    = DatabaseService(shared_cache=shared_cache)
+gazetteer     = Gazetteer(db_service)
+chat_handler  = ChatHandler(llm_client=llm_client, db_service=db_service,
+                            shared_cache=shared_cache, gazetteer=gazetteer)
 ocr_handler   = OCRHandler()
 voice_handler = VoiceHandler()
-db_service    = DatabaseService()
 
 OPENAI_KEY      = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_KEY  = os.getenv("ELEVENLABS_API_KEY")
+API_VERSION     = "1.0.0"
+# Acknowledge WhatsApp webhooks at once and send replies via the Twilio REST API
+WHATSAPP_ASYNC_REPLIES = os.getenv("WHATSAPP_ASYNC_REPLIES", "false").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ocr_handler.start()
+    gazetteer.start()
+    if whatsapp_dispatcher:
+        whatsapp_dispatcher.start()
+    yield
+    if whatsapp_dispatcher:
+        await whatsapp_dispatcher.stop()
+    await gazetteer.stop()
+    # Release pooled connections on shutdown
+    await llm_client.aclose()
+    await db_service.close()
+    await voice_handler.aclose()
+    if shared_cache:
+        await shared_cache.aclose()
+    ocr_handler.shutdown()
 
 # Create FastAPI app
-app = FastAPI(title="Health Assistant API")
+app = FastAPI(title="Health Assistant API", lifespan=lifespan)
+
+# Refuse oversized uploads before they are read into memory
+app.add_middleware(UploadLimitMiddleware, limits=upload_limits())
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -55,6 +95,15 @@ class ChatResponse(BaseModel):
 def health_check():
     return {"status": "healthy", "service": "Health Assistant API"}
 
+@app.get("/health")
+def health():
+    """Liveness probe for load balancers and the benchmark harness"""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "version": API_VERSION,
+    }
+
 # WhatsApp Webhook endpoint for Twilio
 @app.post("/webhook/twilio")
 async def twilio_webhook(request: Request):
@@ -72,23 +121,21 @@ async def twilio_webhook(request: Request):
         
         print(f"WhatsApp message from {from_number}: {message_body}")
         
-        # Handle greetings
-        if is_greeting(message_body):
-            response_text = get_welcome_message()
+        analysis = chat_handler.analyze(message_body)
+        
+        # Fast-ack mode: greetings are answered inline, everything else is
+        # replied to in the background so the webhook returns right away
+        if whatsapp_dispatcher and not _is_greeting(analysis):
+            accepted = whatsapp_dispatcher.enqueue({
+                "from": from_number,
+                "to": form_data.get('To', ''),
+                "body": message_body
+            })
+            if accepted:
+                return PlainTextResponse(content=str(MessagingResponse()), media_type="application/xml")
+            response_text = BUSY_REPLY
         else:
-            # Always use English and only handle offers queries
-            language = "en"
-            
-            # Check if this is an offers query
-            if chat_handler._is_offers_query(message_body, language):
-                # Generate offers response
-                ai_response = await chat_handler.generate_reply(message_body, language)
-            else:
-                # Redirect non-offers queries to offers
-                ai_response = "I can only help you find local offers and deals. Please ask me about offers in your city like 'gold offers in Kolhapur' or 'jewelry discounts in Sangli'."
-            
-            # Format response for WhatsApp (mobile-friendly)
-            response_text = format_for_whatsapp(ai_response)
+            response_text = await build_whatsapp_reply(message_body, analysis)
         
         # Create TwiML response
         twiml_response = MessagingResponse()
@@ -100,17 +147,47 @@ async def twilio_webhook(request: Request):
         print(f"WhatsApp webhook error: {e}")
         # Return error TwiML response
         error_response = MessagingResponse()
-        error_response.message("Sorry, there was a technical issue. Please try again.")
+        error_response.message(ERROR_REPLY)
         return PlainTextResponse(content=str(error_response), media_type="application/xml")
 
+@timed("whatsapp.build_reply")
+async def build_whatsapp_reply(message_body: str, analysis: dict = None) -> str:
+    """Reply text for one WhatsApp message"""
+    # Analyze once; generate_reply reuses the result instead of re-matching
+    analysis = analysis or chat_handler.analyze(message_body)
+    
+    # Handle greetings
+    if _is_greeting(analysis):
+        return get_welcome_message()
+
+    # Always use English and only handle offers queries
+    language = "en"
+    
+    if analysis["offers"]:
+        # Generate offers response
+        ai_response = await chat_handler.generate_reply(message_body, language, analysis=analysis)
+    else:
+        # Redirect non-offers queries to offers
+        ai_response = "I can only help you find local offers and deals. Please ask me about offers in your city like 'gold offers in Kolhapur' or 'jewelry discounts in Sangli'."
+    
+    # Format response for WhatsApp (mobile-friendly)
+    return format_for_whatsapp(ai_response)
+
+whatsapp_dispatcher = WhatsAppDispatcher(reply=build_whatsapp_reply) if WHATSAPP_ASYNC_REPLIES else None
+
 def is_greeting(message: str) -> bool:
     """Check if message is a greeting"""
-    greetings = ['hi', 'hello', 'hey', 'start', 'help']
-    return any(greeting in message.lower() for greeting in greetings)
+    return _is_greeting(chat_handler.analyze(message))
+
+def _is_greeting(analysis: dict) -> bool:
+    # "hi, gold offers in Pune" names what it wants, so it is not just a greeting
+    return analysis["greeting"] and not (analysis["city"] or analysis["category"])
 
 def get_welcome_message() -> str:
     """Get welcome message for WhatsApp users"""
-    return """Hello! Welcome to Local Offers Bot!
+    cities = ", ".join(gazetteer.cities())
+    categories = ", ".join(category.title() for category in gazetteer.categories())
+    return f"""Hello! Welcome to Local Offers Bot!
 
 I help you find the best local offers and deals in your area:
 
@@ -120,11 +197,12 @@ Examples:
 - "latest deals in Pune"
 - "shops offering discounts"
 
-Available cities: Kolhapur, Sangli, Pune, Mumbai
-Available categories: Jewelry, Gold, Diamond
+Available cities: {cities}
+Available categories: {categories}
 
 Ask me about offers in your city!"""
 
+@timed("whatsapp.format")
 def format_for_whatsapp(message: str) -> str:
     """Format message for WhatsApp with proper length and mobile formatting"""
     MAX_LENGTH = 1500  # WhatsApp limit is 4096, but keeping it shorter for mobile
@@ -155,7 +233,56 @@ async def chat(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming chat endpoint (Server-Sent Events)
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the reply as SSE `data:` events carrying {"delta": "..."}"""
+    async def events():
+        try:
+            async for delta in chat_handler.stream_reply(
+                text=request.message,
+                language=request.language
+            ):
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        except Exception:
+            # Failed mid-reply: tell the client the text it has is incomplete
+            yield f"event: error\ndata: {json.dumps({'error': 'The reply was interrupted. Please try again.'})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'language': request.language})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Multimodal endpoint (text + audio + document)
+MULTIMODAL_AUDIO_TIMEOUT = float(os.getenv("MULTIMODAL_AUDIO_TIMEOUT", "30"))
+MULTIMODAL_DOCUMENT_TIMEOUT = float(os.getenv("MULTIMODAL_DOCUMENT_TIMEOUT", "60"))
+
+async def run_stage(name: str, stage, timeout: float) -> Optional[str]:
+    """Run one (text, ok) input stage; a timeout or failure drops that input instead of the request"""
+    try:
+        text, ok = await asyncio.wait_for(stage, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"[multimodal] {name} stage took longer than {timeout}s")
+        return None
+    except Exception as e:
+        print(f"[multimodal] {name} stage failed: {e}")
+        return None
+    if not ok:
+        # The handlers report failures as text; keep it out of the prompt
+        print(f"[multimodal] {name} stage failed: {text}")
+        return None
+    return text
+
+async def _transcribe_upload(upload: UploadFile) -> Tuple[str, bool]:
+    return await voice_handler.transcribe_result(upload.file)
+
+async def _ocr_upload(upload: UploadFile) -> Tuple[str, bool]:
+    with upload_buffer(upload) as data:
+        return await ocr_handler.extract_text_result(data)
+
 @app.post("/multimodal")
 async def multimodal_endpoint(
     text: Optional[str] = Form(None),
@@ -170,20 +297,24 @@ async def multimodal_endpoint(
         if text:
             combined_text += f"User text: {text}\n\n"
         
-        # Process audio input
+        # Audio and document are independent: process them concurrently
+        stages = {}
         if audio:
-            audio_data = await audio.read()
-            transcript = await voice_handler.transcribe(audio_data)
-            combined_text += f"User speech: {transcript}\n\n"
-        
-        # Process document input
+            stages["audio"] = run_stage("audio", _transcribe_upload(audio), MULTIMODAL_AUDIO_TIMEOUT)
         if document:
-            doc_data = await document.read()
-            extracted_text = await ocr_handler.extract_text(doc_data)
-            combined_text += f"Document content: {extracted_text}\n\n"
+            stages["document"] = run_stage("document", _ocr_upload(document), MULTIMODAL_DOCUMENT_TIMEOUT)
+        results = dict(zip(stages, await asyncio.gather(*stages.values())))
+        failed_inputs = [name for name, result in results.items() if result is None]
+
+        if results.get("audio") is not None:
+            combined_text += f"User speech: {results['audio']}\n\n"
+        if results.get("document") is not None:
+            combined_text += f"Document content: {results['document']}\n\n"
         
         # If no inputs provided
         if not combined_text:
+            if failed_inputs:
+                raise HTTPException(status_code=502, detail=f"Could not process input: {', '.join(failed_inputs)}")
             raise HTTPException(status_code=400, detail="No input provided")
         
         # Add instruction for AI to analyze all inputs together
@@ -201,8 +332,10 @@ async def multimodal_endpoint(
             language=language
         )
         
-        return {"response": response}
+        return {"response": response, "failed_inputs": failed_inputs}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -212,10 +345,9 @@ async def ocr_endpoint(
     file: UploadFile = File(...),
     language: str = Form("en")
 ):
-    # Read file bytes
-    data = await file.read()
-    # Extract raw text via OCR
-    extracted = await ocr_handler.extract_text(data)
+    # Extract raw text via OCR, straight from the spooled upload
+    with upload_buffer(file) as data:
+        extracted = await ocr_handler.extract_text(data)
     # Explain it via LLM
     explanation = await chat_handler.generate_reply(
         text=f"Please analyze this medical document text and provide health insights: {extracted}",
@@ -226,24 +358,81 @@ async def ocr_endpoint(
         "explanation": explanation
     }
 
+# Batch OCR endpoint for bulk flyer ingestion (images and/or zip archives)
+OCR_BATCH_MAX_IMAGES = int(os.getenv("OCR_BATCH_MAX_IMAGES", "100"))
+OCR_BATCH_MAX_IMAGE_MB = int(os.getenv("OCR_BATCH_MAX_IMAGE_MB", "20"))
+# Decompressed size of all images in one batch, whatever the archives claim
+OCR_BATCH_MAX_TOTAL_MB = int(os.getenv("OCR_BATCH_MAX_TOTAL_MB", "200"))
+
+@app.post("/ocr/batch")
+async def ocr_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    stream: bool = Form(False)
+):
+    images, total = [], 0
+    try:
+        for upload in files:
+            # Zips are read member by member from the spooled upload itself
+            expanded = await asyncio.to_thread(
+                expand_images, upload.filename or "upload", upload.file,
+                OCR_BATCH_MAX_IMAGES - len(images), OCR_BATCH_MAX_IMAGE_MB * 1024 * 1024,
+                OCR_BATCH_MAX_TOTAL_MB * 1024 * 1024 - total
+            )
+            images += expanded
+            total += sum(len(data) for _, data in expanded)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Invalid zip archive: {e}")
+    if not images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(images) > OCR_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {OCR_BATCH_MAX_IMAGES} images per batch")
+
+    if stream:
+        # One JSON object per line, in completion order
+        async def lines():
+            async for result in ocr_handler.extract_batch(images):
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    start = time.perf_counter()
+    results = [result async for result in ocr_handler.extract_batch(images)]
+    results.sort(key=lambda result: result["index"])
+    return {
+        "results": results,
+        "count": len(results),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
 # 3) Speech-to-text endpoint
 @app.post("/voice/transcribe")  
 async def transcribe_endpoint(file: UploadFile = File(...)):
-    audio = await file.read()
-    transcript = await voice_handler.transcribe(audio_bytes=audio)
+    # The spooled upload is streamed to Whisper as-is
+    transcript = await voice_handler.transcribe(file.file)
     return {"transcript": transcript}
 
 # 4) Text-to-speech endpoint
 @app.post("/voice/synthesize")  
 async def synthesize_endpoint(body: ChatRequest):
-    audio_bytes = await voice_handler.synthesize(
+    audio = voice_handler.stream_synthesize(
         text=body.message,
         language=body.language
     )
-    return StreamingResponse(
-        io.BytesIO(audio_bytes),
-        media_type="audio/mpeg"
-    )
+    # Wait for the first chunk so engine errors still surface as an HTTP error
+    try:
+        first_chunk = await audio.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Speech synthesis failed: {e}")
+
+    async def relay():
+        yield first_chunk
+        async for chunk in audio:
+            yield chunk
+
+    return StreamingResponse(relay(), media_type="audio/mpeg")
 
 # New endpoints for database operations
 @app.get("/api/offers")
@@ -268,8 +457,9 @@ async def get_offers(city: str = None, category: str = None, query: str = None,
 async def get_cities():
     """Get list of available cities"""
     try:
-        cities = await db_service.get_cities()
-        return {"cities": cities, "count": len(cities)}
+        counts = await db_service.get_city_counts()
+        cities = list(counts)
+        return {"cities": cities, "count": len(cities), "offer_counts": counts}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -277,8 +467,9 @@ async def get_cities():
 async def get_categories():
     """Get list of available categories"""
     try:
-        categories = await db_service.get_categories()
-        return {"categories": categories, "count": len(categories)}
+        counts = await db_service.get_category_counts()
+        categories = list(counts)
+        return {"categories": categories, "count": len(categories), "offer_counts": counts}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -305,6 +496,31 @@ async def add_offer(offer: OfferRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Prometheus metrics: stage histograms come from @timed, cache counters are read at scrape time
+cache_collector = CacheCollector()
+cache_collector.add_cache("offers", db_service.cache)
+cache_collector.add_cache("replies", chat_handler.response_cache.cache)
+cache_collector.add_cache("ocr", ocr_handler.cache)
+cache_collector.add_cache("ocr_disk", ocr_handler.disk_cache)
+cache_collector.add_cache("audio", voice_handler.audio_cache)
+cache_collector.add_cache("audio_disk", voice_handler.audio_disk_cache)
+if shared_cache:
+    cache_collector.add_cache("shared", shared_cache)
+if whatsapp_dispatcher:
+    cache_collector.add_gauges("whatsapp_jobs", "WhatsApp reply jobs by state", whatsapp_dispatcher.stats)
+metrics.register(cache_collector)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    if not metrics.enabled():
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+# Outermost, so rejected uploads and CORS preflights are timed too; added
+# after every route so each path gets its own label
+app.add_middleware(MetricsMiddleware, routes={route.path for route in app.routes})
+
 # Allow `python app.py` to work by invoking Uvicorn
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,4 @@
+"""
+Benchmarks Package
+Standalone performance benchmarks for the backend; run from backend/ with `python -m benchmarks.<name>`
+"""
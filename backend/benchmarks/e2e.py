@@ -0,0 +1,224 @@
+"""
+End-to-End API Benchmark
+Latency percentiles and throughput for the main endpoints, against local fake Supabase and OpenAI servers
+
+Usage (from backend/):
+    python -m benchmarks.e2e                                  # every scenario at 1, 8 and 32 concurrent
+    python -m benchmarks.e2e --scenarios chat,offers --concurrency 16,64
+    python -m benchmarks.e2e --supabase-ms 20 --openai-ms 800 # slower downstreams
+    python -m benchmarks.e2e --json results/e2e.json          # save results for comparison
+"""
+
+import json
+import time
+import asyncio
+import argparse
+from typing import Callable, Dict, List
+
+import httpx
+
+from benchmarks.harness import (
+    Backend,
+    FakeOpenAI,
+    FakeSupabase,
+    backend_env,
+    git_commit,
+    summarize,
+)
+
+AUDIO = b"RIFF" + b"\x00" * 4096  # transcription is faked; only the upload is real
+
+# Each scenario builds request i; streamed replies are timed to the last byte.
+# Unless --cached, a request number goes into the query so the offer and reply
+# caches miss and every layer is exercised.
+
+
+def chat(i: int, unique: bool) -> Dict:
+    suffix = f" ref {i}" if unique else ""
+    return {
+        "method": "POST",
+        "url": "/api/chat",
+        "json": {"message": f"gold offers in Kolhapur{suffix}", "language": "en"},
+    }
+
+
+def chat_stream(i: int, unique: bool) -> Dict:
+    request = chat(i, unique)
+    request["url"] = "/api/chat/stream"
+    return request
+
+
+def offers(i: int, unique: bool) -> Dict:
+    query = f"gold {i}" if unique else "gold"
+    return {
+        "method": "GET",
+        "url": "/api/offers",
+        "params": {"query": query, "city": "Kolhapur", "limit": 10},
+    }
+
+
+def webhook(i: int, unique: bool) -> Dict:
+    suffix = f" ref {i}" if unique else ""
+    return {
+        "method": "POST",
+        "url": "/webhook/twilio",
+        "data": {
+            "From": f"whatsapp:+9198{i:08d}",
+            "To": "whatsapp:+14155238886",
+            "Body": f"jewellery deals in Sangli{suffix}",
+        },
+    }
+
+
+def multimodal(i: int, unique: bool) -> Dict:
+    suffix = f" ref {i}" if unique else ""
+    return {
+        "method": "POST",
+        "url": "/multimodal",
+        "data": {"text": f"any offers on necklaces{suffix}", "language": "en"},
+        "files": {"audio": ("voice.wav", AUDIO, "audio/wav")},
+    }
+
+
+SCENARIOS: Dict[str, Callable[[int, bool], Dict]] = {
+    "chat": chat,
+    "chat_stream": chat_stream,
+    "offers": offers,
+    "webhook": webhook,
+    "multimodal": multimodal,
+}
+
+
+async def run_level(
+    base_url: str,
+    scenario: Callable[[int, bool], Dict],
+    concurrency: int,
+    requests: int,
+    warmup: int,
+    unique: bool,
+    offset: int,
+) -> Dict:
+    """Closed loop: `concurrency` clients each send their next request as soon as one finishes"""
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=120
+    ) as client:
+
+        async def phase(indices: range):
+            latencies: List[float] = []
+            errors = 0
+            pending = iter(indices)
+
+            async def worker():
+                nonlocal errors
+                for i in pending:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(**scenario(i, unique))
+                        ok = response.status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return latencies, errors, time.perf_counter() - start
+
+        # Opens the connections and fills per-process state; not recorded
+        await phase(range(offset, offset + warmup))
+        return summarize(
+            *await phase(range(offset + warmup, offset + warmup + requests))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="per level")
+    parser.add_argument("--warmup", type=int, default=10, help="per level")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers")
+    parser.add_argument("--supabase-ms", type=float, default=5)
+    parser.add_argument("--openai-ms", type=float, default=300)
+    parser.add_argument("--offers", type=int, default=200, help="rows in fake DB")
+    parser.add_argument(
+        "--cached", action="store_true", help="repeat identical queries (cache hits)"
+    )
+    parser.add_argument("--server-log", help="write backend output to this file")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    supabase = FakeSupabase(args.supabase_ms / 1000, offers=args.offers).start()
+    openai = FakeOpenAI(args.openai_ms / 1000).start()
+
+    print("END-TO-END API BENCHMARK")
+    print("=" * 72)
+    print(
+        f"Requests/level: {args.requests}  Workers: {args.workers}  "
+        f"Supabase: {args.supabase_ms} ms  OpenAI: {args.openai_ms} ms  "
+        f"Caches: {'warm' if args.cached else 'bypassed'}"
+    )
+    print(
+        f"\n{'scenario':<12}{'conc':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}"
+    )
+
+    results = []
+    offset = 0
+    with Backend(
+        backend_env(supabase, openai), workers=args.workers, log_path=args.server_log
+    ) as backend:
+        for name in scenarios:
+            for concurrency in levels:
+                result = asyncio.run(
+                    run_level(
+                        backend.url,
+                        SCENARIOS[name],
+                        concurrency,
+                        args.requests,
+                        args.warmup,
+                        not args.cached,
+                        offset,
+                    )
+                )
+                offset += args.requests + args.warmup
+                result.update(scenario=name, concurrency=concurrency)
+                results.append(result)
+                print(
+                    f"{name:<12}{concurrency:>6}{result['rps']:>9.1f}"
+                    f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                    f"{result['p99_ms']:>10.1f}{result['errors']:>8}"
+                )
+
+    supabase.stop()
+    openai.stop()
+    print(f"\nDownstream calls: Supabase {supabase.requests}, OpenAI {openai.requests}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "args": vars(args),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
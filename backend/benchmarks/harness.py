@@ -0,0 +1,433 @@
+"""
+Benchmark Harness
+Local stand-ins for Supabase, OpenAI and Twilio, a backend process pointed at them, and latency summaries
+
+The fakes are plain threaded HTTP servers that sleep for a configurable
+time before answering, so the backend under test does real network I/O
+against predictable downstreams.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CITIES = ["Kolhapur", "Sangli", "Pune", "Mumbai", "Satara"]
+CATEGORIES = ["jewellery", "clothing", "electronics", "grocery"]
+
+REPLY = (
+    "Here are the best offers I found:\n"
+    "1. Shree Jewellers - 20% off making charges on gold, valid till month end.\n"
+    "2. Mahalaxmi Gold - free silver coin on purchases above Rs 50,000.\n"
+    "Shree Jewellers is the better deal if you are buying heavier pieces."
+)
+TRANSCRIPT = "gold offers in Kolhapur"
+
+
+def sample_offers(count: int) -> List[Dict]:
+    """Deterministic offer rows spread across the cities and categories"""
+    return [
+        {
+            "id": i + 1,
+            "store_name": f"Store {i + 1}",
+            "city": CITIES[i % len(CITIES)],
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "offer_text": f"{10 + i % 40}% off on {CATEGORIES[i % len(CATEGORIES)]}",
+            "price_range": f"₹{1000 * (1 + i % 9)}-₹{10000 * (1 + i % 9)}",
+            "valid_till": f"2026-12-{1 + i % 28:02d}",
+        }
+        for i in range(count)
+    ]
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded HTTP server on a free local port that waits `latency` seconds per request"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send_json(self, payload, status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def begin(self) -> None:
+        self.server.count()
+        time.sleep(self.server.latency)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSupabase(StubServer):
+    """PostgREST endpoints the backend uses: offers, offer_catalog, business_places,
+    place_aliases, and the search_offers / ranked_offers functions"""
+
+    def __init__(self, latency: float = 0.0, offers: int = 200):
+        super().__init__(_SupabaseHandler, latency)
+        self.offers = sample_offers(offers)
+
+    def filter(
+        self, city: Optional[str], category: Optional[str], limit: int
+    ) -> List[Dict]:
+        rows = [
+            offer
+            for offer in self.offers
+            if (not city or city.lower() in offer["city"].lower())
+            and (not category or offer["category"] == category)
+        ]
+        return rows[:limit]
+
+    def catalog(self) -> List[Dict]:
+        counts: Dict = {}
+        for offer in self.offers:
+            for kind in ("city", "category"):
+                key = (kind, offer[kind])
+                counts[key] = counts.get(key, 0) + 1
+        return [
+            {"kind": kind, "value": value, "offer_count": count}
+            for (kind, value), count in counts.items()
+        ]
+
+
+class _SupabaseHandler(_StubHandler):
+    def do_GET(self):
+        self.begin()
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        table = url.path.rsplit("/", 1)[-1]
+        server = self.server
+
+        if table == "offers":
+            city = params.get("city", "").removeprefix("ilike.").strip("*")
+            category = params.get("category", "").removeprefix("eq.")
+            limit = int(params.get("limit", len(server.offers)))
+            self.send_json(server.filter(city, category, limit))
+        elif table == "offer_catalog":
+            self.send_json(server.catalog())
+        elif table == "business_places":
+            places = {(o["city"], o["category"]) for o in server.offers}
+            self.send_json(
+                [{"city": city, "category": category} for city, category in places]
+            )
+        elif table == "place_aliases":
+            self.send_json([{"alias": "poona", "kind": "city", "value": "Pune"}])
+        else:
+            self.send_json({"message": f"relation {table} does not exist"}, 404)
+
+    def do_POST(self):
+        self.begin()
+        body = json.loads(self.read_body() or b"{}")
+        path = urlsplit(self.path).path
+        server = self.server
+
+        if path.endswith("/rpc/search_offers"):
+            self.send_json(
+                server.filter(
+                    body.get("city_filter"),
+                    body.get("category_filter"),
+                    body.get("max_results", 10),
+                )
+            )
+        elif path.endswith("/rpc/ranked_offers"):
+            rows = server.filter(
+                body.get("city_filter"),
+                body.get("category_filter"),
+                body.get("max_results", 5),
+            )
+            tier = "query"
+            if not rows:
+                rows, tier = server.offers[: body.get("trending_limit", 3)], "trending"
+            self.send_json(
+                [
+                    {"offer": row, "match_tier": tier, "match_score": 1.0 / position}
+                    for position, row in enumerate(rows, 1)
+                ]
+            )
+        elif path.endswith("/offers"):
+            self.send_json([dict(body, id=len(server.offers) + 1)], 201)
+        else:
+            self.send_json({"message": "function not found"}, 404)
+
+
+class FakeOpenAI(StubServer):
+    """Chat completions (plain and streamed) and Whisper transcriptions"""
+
+    def __init__(self, latency: float = 0.0, reply: str = REPLY):
+        super().__init__(_OpenAIHandler, latency)
+        self.reply = reply
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+
+class _OpenAIHandler(_StubHandler):
+    def do_POST(self):
+        body = self.read_body()
+        path = urlsplit(self.path).path
+        if path.endswith("/audio/transcriptions"):
+            self.begin()
+            self.send_json({"text": TRANSCRIPT})
+        elif path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            if request.get("stream"):
+                self.stream_completion(request)
+            else:
+                self.begin()
+                self.send_json(self.completion(request))
+        else:
+            self.send_json({"error": {"message": "unknown endpoint"}}, 404)
+
+    def completion(self, request: Dict) -> Dict:
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.server.reply},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def stream_completion(self, request: Dict) -> None:
+        """Server-sent events, with the configured latency spread across the tokens"""
+        self.server.count()
+        words = self.server.reply.split(" ")
+        delay = self.server.latency / (len(words) + 1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(delay)
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o-mini"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            time.sleep(delay)
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeTwilio(StubServer):
+    """Messages REST API; records when each recipient's reply arrived"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(_TwilioHandler, latency)
+        self.delivered: Dict[str, float] = {}
+
+    def record(self, to_number: str) -> None:
+        with self._lock:
+            self.delivered[to_number] = time.perf_counter()
+
+
+class _TwilioHandler(_StubHandler):
+    def do_POST(self):
+        self.begin()
+        form = {
+            key: values[0]
+            for key, values in parse_qs(self.read_body().decode()).items()
+        }
+        if not urlsplit(self.path).path.endswith("/Messages.json"):
+            self.send_json({"message": "not found"}, 404)
+            return
+        self.server.record(form.get("To", ""))
+        self.send_json(
+            {"sid": f"SM{len(self.server.delivered):032x}", "status": "queued"}, 201
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Backend:
+    """The FastAPI app in its own Uvicorn process, configured through the environment"""
+
+    def __init__(
+        self,
+        env: Dict[str, str],
+        workers: int = 1,
+        log_path: Optional[str] = None,
+        startup_timeout: float = 60.0,
+    ):
+        self.port = free_port()
+        self.env = env
+        self.workers = workers
+        self.log_path = log_path
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "Backend":
+        env = dict(os.environ)
+        # Never let a developer's .env or Redis leak into a benchmark run
+        env.pop("REDIS_URL", None)
+        env.pop("ELEVENLABS_API_KEY", None)
+        env.update(self.env)
+        log = open(self.log_path, "w") if self.log_path else subprocess.DEVNULL
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app:app",
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning",
+            ],  # fmt: skip
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        self._wait_until_healthy()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def _wait_until_healthy(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(
+                    f"backend exited with {self.process.returncode}; "
+                    "run with --server-log to see why"
+                )
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"backend not healthy after {self.startup_timeout}s")
+
+
+def backend_env(
+    supabase: FakeSupabase, openai: FakeOpenAI, twilio: Optional[FakeTwilio] = None
+) -> Dict[str, str]:
+    env = {
+        "SUPABASE_URL": supabase.url,
+        "SUPABASE_KEY": "bench",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": openai.base_url,
+        "OCR_WARM_WORKERS": "false",
+    }
+    if twilio:
+        env.update(
+            TWILIO_API_BASE=twilio.url,
+            TWILIO_ACCOUNT_SID="ACbench",
+            TWILIO_AUTH_TOKEN="bench",
+        )
+    return env
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Latency percentiles in ms plus throughput for one run"""
+    ordered = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "rps": total / elapsed if elapsed else 0.0,
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit the results were measured at, for comparing runs"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,152 @@
+"""
+Intent Matcher Benchmark
+Messages per second for the old keyword-list scans vs. the single precompiled IntentMatcher pass
+
+Usage (from backend/):
+    python -m benchmarks.intent_matcher                   # 20k synthetic messages
+    python -m benchmarks.intent_matcher --messages 100000 --json intent.json
+"""
+
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+from intent_matcher import IntentMatcher
+
+TEMPLATES = [
+    "gold offers in {city}",
+    "any diamond necklace discounts near {city}?",
+    "Hi, what are the latest bangle deals in {city} this week",
+    "show me jewellery shops",
+    "where can I buy silver rings cheap",
+    "tell me a joke",
+    "what is the weather like today in {city}",
+    "thanks, that was helpful",
+    "Is there any sale on earrings? I am looking for something for my sister's wedding",
+]
+CITIES = ["Kolhapur", "Sangli", "Pune", "Mumbai", "Nashik"]
+
+
+def legacy_analyze(text: str) -> Dict:
+    """ChatHandler's previous routing: three methods, each rebuilding its lists"""
+    return {
+        "offers": _legacy_is_offers_query(text),
+        "city": _legacy_extract_city(text),
+        "category": _legacy_extract_category(text),
+    }
+
+
+def _legacy_is_offers_query(text: str) -> bool:
+    offer_keywords_en = [
+        "offer", "offers", "deal", "deals", "discount", "discounts", "sale", "sales",
+        "price", "prices", "cheap", "store", "stores", "shop", "shops",
+        "jewellery", "jewelry", "gold", "diamond", "bangles", "rings", "buy",
+        "purchase", "shopping", "mall", "market", "latest", "best", "available",
+        "near", "local", "area", "city",
+    ]  # fmt: skip
+    text_lower = text.lower()
+    if any(keyword in text_lower for keyword in offer_keywords_en):
+        return True
+    cities = ["kolhapur", "sangli", "pune", "mumbai"]
+    if any(city in text_lower for city in cities):
+        return True
+    shopping_terms = ["what", "where", "show", "find", "get", "any", "available"]
+    return any(term in text_lower for term in shopping_terms)
+
+
+def _legacy_extract_city(text: str) -> str:
+    city_mapping = {
+        "kolhapur": "Kolhapur",
+        "sangli": "Sangli",
+        "pune": "Pune",
+        "mumbai": "Mumbai",
+    }
+    text_lower = text.lower()
+    for key, value in city_mapping.items():
+        if key in text_lower:
+            return value
+    return None
+
+
+def _legacy_extract_category(text: str) -> str:
+    category_keywords = {
+        "jewellery": [
+            "jewellery", "jewelry", "gold", "diamond", "bangles", "rings",
+            "necklace", "silver",
+        ]
+    }  # fmt: skip
+    text_lower = text.lower()
+    for category, keywords in category_keywords.items():
+        if any(keyword in text_lower for keyword in keywords):
+            return category
+    return None
+
+
+def make_messages(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(city=rng.choice(CITIES)) for _ in range(count)]
+
+
+def measure(name: str, analyze: Callable[[str], Dict], messages) -> Dict:
+    start = time.perf_counter()
+    for message in messages:
+        analyze(message)
+    elapsed = time.perf_counter() - start
+    return {
+        "matcher": name,
+        "messages": len(messages),
+        "messages_per_s": len(messages) / elapsed,
+        "us_per_message": elapsed / len(messages) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    matcher = IntentMatcher()
+    # Warm up both paths
+    for message in messages[:1000]:
+        legacy_analyze(message)
+        matcher.analyze(message)
+
+    print("INTENT MATCHER BENCHMARK")
+    print("=" * 60)
+    print(f"Messages: {len(messages)}  Templates: {len(TEMPLATES)}")
+
+    # Before: the webhook checked intent, then generate_reply checked it again
+    # and extracted city and category separately
+    results = [
+        measure("legacy", legacy_analyze, messages),
+        measure(
+            "legacy-webhook",
+            lambda text: (_legacy_is_offers_query(text), legacy_analyze(text)),
+            messages,
+        ),
+        measure("compiled", matcher.analyze, messages),
+    ]
+
+    print(f"\n{'matcher':<16}{'msgs/s':>12}{'us/msg':>10}")
+    for r in results:
+        print(
+            f"{r['matcher']:<16}{r['messages_per_s']:>12.0f}{r['us_per_message']:>10.2f}"
+        )
+    legacy, webhook, compiled = results
+    print(
+        f"\nSpeed-up: {compiled['messages_per_s'] / legacy['messages_per_s']:.1f}x "
+        f"(vs. webhook path {compiled['messages_per_s'] / webhook['messages_per_s']:.1f}x)"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
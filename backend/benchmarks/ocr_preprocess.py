@@ -0,0 +1,182 @@
+"""
+OCR Pre-processing Benchmark
+Compares latency and peak memory of OCR on raw full-resolution images vs. the pre-processing pipeline
+
+Usage (from backend/):
+    python -m benchmarks.ocr_preprocess                      # synthetic 12MP flyers
+    python -m benchmarks.ocr_preprocess --images ./flyers    # your own JPEG/PNG flyers
+    python -m benchmarks.ocr_preprocess --no-ocr             # pre-processing stage only
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import multiprocessing
+from typing import Dict, List
+
+from ocr_handler import default_settings, preprocess_image
+
+FLYER_LINES = [
+    "SHRI JEWELLERS - KOLHAPUR",
+    "15% OFF ON GOLD BANGLES",
+    "No making charges on wedding sets",
+    "Valid till 30 June",
+]
+
+
+def make_flyers(count: int, size=(4032, 3024)) -> List[bytes]:
+    """Synthetic phone-photo flyers: 12MP JPEGs, some rotated via EXIF"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.load_default(size=160)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        font = ImageFont.load_default()
+
+    flyers = []
+    for i in range(count):
+        img = Image.new("RGB", size, (235, 225, 205))
+        draw = ImageDraw.Draw(img)
+        for line_no, line in enumerate(FLYER_LINES):
+            draw.text((200, 300 + line_no * 500), line, fill=(60, 30, 10), font=font)
+        exif = Image.Exif()
+        if i % 2:
+            # Stored sideways, as phones do for portrait shots
+            img = img.transpose(Image.Transpose.ROTATE_90)
+            exif[0x0112] = 6
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=90, exif=exif)
+        flyers.append(buf.getvalue())
+    return flyers
+
+
+def load_images(directory: str) -> List[bytes]:
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append(f.read())
+    return images
+
+
+def raw_pipeline(image_bytes: bytes, settings: Dict):
+    """What OCRHandler did before pre-processing: full-resolution RGB array"""
+    import numpy as np
+    from PIL import Image
+
+    return np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+
+
+def processed_pipeline(image_bytes: bytes, settings: Dict):
+    return preprocess_image(image_bytes, **settings)
+
+
+PIPELINES = {"raw": raw_pipeline, "preprocessed": processed_pipeline}
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _run_variant(name, images, settings, run_ocr, repeat, queue):
+    """Runs in a fresh process so peak RSS belongs to this variant only"""
+    reader = None
+    if run_ocr:
+        import easyocr
+
+        reader = easyocr.Reader(["en"], gpu=False)
+    baseline = _max_rss_mb()
+
+    latencies, texts = [], []
+    for _ in range(repeat):
+        for image_bytes in images:
+            start = time.perf_counter()
+            arr = PIPELINES[name](image_bytes, settings)
+            if reader is not None:
+                results = reader.readtext(arr)
+                texts.append(" ".join(t for (_, t, p) in results if p > 0.5))
+            latencies.append(time.perf_counter() - start)
+
+    queue.put(
+        {
+            "pipeline": name,
+            "images": len(images) * repeat,
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+            "peak_rss_mb": _max_rss_mb(),
+            "peak_rss_over_baseline_mb": _max_rss_mb() - baseline,
+            "sample_text": texts[0] if texts else None,
+        }
+    )
+
+
+def run(images, settings, run_ocr, repeat) -> List[Dict]:
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in PIPELINES:
+        queue = context.Queue()
+        process = context.Process(
+            target=_run_variant, args=(name, images, settings, run_ocr, repeat, queue)
+        )
+        process.start()
+        results.append(queue.get())
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument(
+        "--images", help="directory of flyer images (default: synthetic)"
+    )
+    parser.add_argument(
+        "--count", type=int, default=4, help="synthetic images to generate"
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-side", type=int, default=None)
+    parser.add_argument(
+        "--no-ocr", action="store_true", help="time pre-processing only"
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    settings = default_settings()
+    if args.max_side is not None:
+        settings["max_side"] = args.max_side
+    images = load_images(args.images) if args.images else make_flyers(args.count)
+
+    print("OCR PRE-PROCESSING BENCHMARK")
+    print("=" * 60)
+    print(f"Images: {len(images)} x {args.repeat}  Settings: {settings}")
+    print(
+        f"Stage: {'decode + pre-process' if args.no_ocr else 'decode + pre-process + readtext'}"
+    )
+
+    results = run(images, settings, not args.no_ocr, args.repeat)
+
+    print(
+        f"\n{'pipeline':<14}{'mean ms':>10}{'p95 ms':>10}{'peak RSS MB':>14}{'over base MB':>14}"
+    )
+    for r in results:
+        print(
+            f"{r['pipeline']:<14}{r['mean_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['peak_rss_mb']:>14.1f}{r['peak_rss_over_baseline_mb']:>14.1f}"
+        )
+    raw, processed = results
+    print(f"\nSpeed-up: {raw['mean_ms'] / processed['mean_ms']:.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Voice HTTP Client Benchmark
+Compares ElevenLabs calls made with a fresh httpx client per call vs. VoiceHandler's pooled client
+
+Usage (from backend/):
+    python -m benchmarks.voice_http_client                     # 200 calls, 4 at a time
+    python -m benchmarks.voice_http_client --calls 500 --concurrency 16
+    python -m benchmarks.voice_http_client --latency-ms 50     # slower stub server
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import httpx
+
+AUDIO = b"\xff\xfb\x90\x64" * 4096  # ~16KB of "MP3"
+
+
+class StubElevenLabs(ThreadingHTTPServer):
+    """Local stand-in for api.elevenlabs.io that counts TCP connections"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.latency = latency
+        self.connections = 0
+
+    def get_request(self):
+        self.connections += 1
+        return super().get_request()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(AUDIO)))
+        self.end_headers()
+        self.wfile.write(AUDIO)
+
+    def log_message(self, *args):
+        pass
+
+
+async def per_call_client(voice, text: str) -> bytes:
+    """What VoiceHandler did before: a new client (and connection) per synthesis"""
+    headers, json_data = voice._eleven_request(text)
+    async with httpx.AsyncClient(base_url=str(voice.http_client.base_url)) as client:
+        r = await client.post(
+            "/v1/text-to-speech/voice", json=json_data, headers=headers
+        )
+    r.raise_for_status()
+    return r.content
+
+
+async def pooled_client(voice, text: str) -> bytes:
+    return await voice._eleven_tts(text)
+
+
+VARIANTS = {"per-call": per_call_client, "pooled": pooled_client}
+
+
+async def run_variant(name, server, calls, concurrency) -> Dict:
+    from voice_handler import VoiceHandler
+
+    voice = VoiceHandler()
+    voice.eleven_key = "bench"
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int):
+        async with slots:
+            start = time.perf_counter()
+            await VARIANTS[name](voice, f"Offer number {i}")
+            latencies.append(time.perf_counter() - start)
+
+    connections = server.connections
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    await voice.aclose()
+
+    latencies.sort()
+    return {
+        "client": name,
+        "calls": calls,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "calls_per_s": calls / elapsed,
+        "connections": server.connections - connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--latency-ms", type=float, default=5, help="stub server think time"
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    server = StubElevenLabs(args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ELEVENLABS_BASE_URL"] = server.url
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    print("VOICE HTTP CLIENT BENCHMARK")
+    print("=" * 60)
+    print(
+        f"Calls: {args.calls}  Concurrency: {args.concurrency}  "
+        f"Stub latency: {args.latency_ms} ms  Server: {server.url}"
+    )
+
+    results = [
+        asyncio.run(run_variant(name, server, args.calls, args.concurrency))
+        for name in VARIANTS
+    ]
+    server.shutdown()
+
+    print(
+        f"\n{'client':<12}{'mean ms':>10}{'p95 ms':>10}{'calls/s':>10}{'connections':>13}"
+    )
+    for r in results:
+        print(
+            f"{r['client']:<12}{r['mean_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+            f"{r['calls_per_s']:>10.1f}{r['connections']:>13}"
+        )
+    per_call, pooled = results
+    print(f"\nSaved per call: {per_call['mean_ms'] - pooled['mean_ms']:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
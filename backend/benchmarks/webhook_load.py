@@ -0,0 +1,409 @@
+"""
+WhatsApp Webhook Load Test
+Replays Twilio webhook traffic against /webhook/twilio in ramp or burst patterns, with every downstream stubbed locally
+
+Usage (from backend/):
+    python -m benchmarks.webhook_load                                   # 1 -> 20 msg/s ramp over 30s
+    python -m benchmarks.webhook_load --profile burst --burst-size 300  # promotion spikes on a 2 msg/s base
+    python -m benchmarks.webhook_load --async-replies --workers 2       # fast-ack mode, replies via fake Twilio
+    python -m benchmarks.webhook_load --replay captured.jsonl --json webhook.json
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.harness import (
+    Backend,
+    FakeOpenAI,
+    FakeSupabase,
+    FakeTwilio,
+    backend_env,
+    git_commit,
+    percentile,
+    summarize,
+)
+from whatsapp_dispatcher import BUSY_REPLY, ERROR_REPLY
+
+# What people actually send after a promotion: mostly offer questions, some
+# openers, and a tail of things the bot does not handle
+MESSAGES = {
+    "greeting": [
+        "hi",
+        "Hello",
+        "hey there",
+        "Namaste",
+        "Hi, what can you do?",
+        "start",
+    ],
+    "offers": [
+        "gold offers in Kolhapur",
+        "any jewellery discount in Sangli?",
+        "necklace deals near Rajarampuri",
+        "latest deals in Pune",
+        "silver earrings offers Mumbai",
+        "shops offering discounts in Satara",
+        "Bangles sale in kolhapur",
+        "hi, gold offers in Pune please",
+    ],
+    "offtopic": [
+        "what's the weather tomorrow",
+        "tell me a joke",
+        "who won the match yesterday",
+        "ok thanks",
+        "👍",
+        "can you book a cab",
+    ],
+}
+
+BOT_NUMBER = "whatsapp:+14155238886"
+
+
+def twilio_form(i: int, body: str) -> Dict[str, str]:
+    """The fields Twilio posts for an inbound WhatsApp text message"""
+    sid = f"SM{i:032x}"
+    return {
+        "SmsMessageSid": sid,
+        "NumMedia": "0",
+        "ProfileName": f"Customer {i}",
+        "SmsSid": sid,
+        "WaId": f"9198{i:08d}",
+        "SmsStatus": "received",
+        "Body": body,
+        "To": BOT_NUMBER,
+        "NumSegments": "1",
+        "ReferralNumMedia": "0",
+        "MessageSid": sid,
+        "AccountSid": "ACbench",
+        "From": f"whatsapp:+9198{i:08d}",
+        "ApiVersion": "2010-04-01",
+    }
+
+
+def synthetic_messages(count: int, mix: Dict[str, float], seed: int) -> List[Tuple]:
+    """(kind, form) pairs drawn from MESSAGES with the given kind weights"""
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [
+        (kind, twilio_form(i, rng.choice(MESSAGES[kind])))
+        for i, kind in enumerate(kinds)
+    ]
+
+
+def replayed_messages(path: str, count: int) -> List[Tuple]:
+    """Captured webhook forms (one JSON object per line), cycled to `count`.
+
+    An optional "kind" key labels the message in the report. Sender fields
+    are renumbered so each replayed message is a distinct conversation.
+    """
+    with open(path) as f:
+        captured = [json.loads(line) for line in f if line.strip()]
+    if not captured:
+        raise SystemExit(f"{path} has no messages")
+    messages = []
+    for i in range(count):
+        form = dict(captured[i % len(captured)])
+        kind = form.pop("kind", "replayed")
+        fresh = twilio_form(i, form.get("Body", ""))
+        form.update({key: fresh[key] for key in ("From", "WaId", "MessageSid")})
+        messages.append((kind, form))
+    return messages
+
+
+def ramp_schedule(duration: float, start_rps: float, peak_rps: float) -> List[float]:
+    """Arrival offsets with the rate rising linearly from start_rps to peak_rps"""
+    times, due, t, step = [], 0.0, 0.0, 0.001
+    while t < duration:
+        due += (start_rps + (peak_rps - start_rps) * t / duration) * step
+        while due >= 1:
+            times.append(t)
+            due -= 1
+        t += step
+    return times
+
+
+def burst_schedule(
+    duration: float, base_rps: float, size: int, every: float, spread: float
+) -> List[float]:
+    """A steady base rate plus `size` extra messages every `every` seconds"""
+    times = ramp_schedule(duration, base_rps, base_rps)
+    at = every / 2
+    while at < duration:
+        times.extend(at + spread * n / size for n in range(size))
+        at += every
+    return sorted(times)
+
+
+def classify(response: httpx.Response) -> str:
+    """ok, error (HTTP failure or the error TwiML) or shed (the busy TwiML)"""
+    if response.status_code != 200:
+        return "error"
+    try:
+        replies = [m.text for m in ET.fromstring(response.content).iter("Message")]
+    except ET.ParseError:
+        return "error"
+    if ERROR_REPLY in replies:
+        return "error"
+    if BUSY_REPLY in replies:
+        return "shed"
+    return "ok"
+
+
+async def replay(
+    base_url: str,
+    messages: List[Tuple],
+    schedule: List[float],
+    timeout: float,
+    max_connections: int,
+) -> List[Dict]:
+    """Open loop: each message goes out at its scheduled time whether or not earlier ones returned"""
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    results: List[Dict] = []
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+        start = time.perf_counter()
+
+        async def send(kind: str, form: Dict, at: float):
+            await asyncio.sleep(max(0.0, start + at - time.perf_counter()))
+            sent = time.perf_counter()
+            try:
+                outcome = classify(await client.post("/webhook/twilio", data=form))
+            except httpx.TimeoutException:
+                outcome = "timeout"
+            except httpx.HTTPError:
+                outcome = "error"
+            results.append(
+                {
+                    "kind": kind,
+                    "to": form["From"],
+                    "at": at,
+                    "lag": sent - start - at,
+                    "sent": sent,
+                    "latency": time.perf_counter() - sent,
+                    "outcome": outcome,
+                }
+            )
+
+        await asyncio.gather(
+            *(send(kind, form, at) for (kind, form), at in zip(messages, schedule))
+        )
+    return results
+
+
+def report(results: List[Dict], elapsed: float, thresholds: List[float]) -> Dict:
+    def group(rows: List[Dict]) -> Dict:
+        ok = [r["latency"] for r in rows if r["outcome"] in ("ok", "shed")]
+        summary = summarize(ok, len(rows) - len(ok), elapsed)
+        for outcome in ("shed", "timeout"):
+            summary[outcome] = sum(r["outcome"] == outcome for r in rows)
+        return summary
+
+    kinds = sorted({r["kind"] for r in results})
+    overall = group(results)
+    overall["max_send_lag_ms"] = max((r["lag"] for r in results), default=0) * 1000
+    breaches = {
+        f"{ms:g}": sum(
+            r["outcome"] == "timeout" or r["latency"] * 1000 > ms for r in results
+        )
+        for ms in thresholds
+    }
+
+    # One-second windows by scheduled send time, to see what a burst does
+    timeline = []
+    for second in range(int(max((r["at"] for r in results), default=0)) + 1):
+        rows = [r for r in results if int(r["at"]) == second]
+        latencies = sorted(r["latency"] for r in rows)
+        timeline.append(
+            {
+                "second": second,
+                "sent": len(rows),
+                "errors": sum(r["outcome"] in ("error", "timeout") for r in rows),
+                "p95_ms": percentile(latencies, 95) * 1000,
+            }
+        )
+
+    return {
+        "overall": overall,
+        "by_kind": {
+            kind: group([r for r in results if r["kind"] == kind]) for kind in kinds
+        },
+        "threshold_breaches": breaches,
+        "timeline": timeline,
+    }
+
+
+async def wait_for_deliveries(twilio: FakeTwilio, expected: int, limit: float):
+    deadline = time.perf_counter() + limit
+    while len(twilio.delivered) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+
+
+def delivery_report(results: List[Dict], twilio: FakeTwilio) -> Dict:
+    """Fast-ack mode: time from the webhook call to the reply reaching Twilio"""
+    acked = [r for r in results if r["outcome"] == "ok" and r["kind"] != "greeting"]
+    latencies = sorted(
+        twilio.delivered[r["to"]] - r["sent"]
+        for r in acked
+        if r["to"] in twilio.delivered
+    )
+    return {
+        "queued": len(acked),
+        "delivered": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in MESSAGES:
+            raise argparse.ArgumentTypeError(f"unknown message kind: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[2])
+    parser.add_argument("--profile", choices=["ramp", "burst"], default="ramp")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--start-rps", type=float, default=1, help="ramp")
+    parser.add_argument("--peak-rps", type=float, default=20, help="ramp")
+    parser.add_argument("--base-rps", type=float, default=2, help="burst")
+    parser.add_argument("--burst-size", type=int, default=200, help="burst")
+    parser.add_argument("--burst-every", type=float, default=10, help="burst")
+    parser.add_argument(
+        "--burst-spread", type=float, default=1, help="seconds each burst lasts"
+    )
+    parser.add_argument(
+        "--mix", type=parse_mix, default="greeting=0.2,offers=0.6,offtopic=0.2"
+    )
+    parser.add_argument("--replay", help="JSONL of captured webhook forms")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--thresholds",
+        default="1000,5000,15000",
+        help="ms; Twilio gives up on a webhook after 15s",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=15, help="client gives up after (s)"
+    )
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers")
+    parser.add_argument(
+        "--async-replies", action="store_true", help="WHATSAPP_ASYNC_REPLIES=true"
+    )
+    parser.add_argument("--supabase-ms", type=float, default=5)
+    parser.add_argument("--openai-ms", type=float, default=800)
+    parser.add_argument("--twilio-ms", type=float, default=100)
+    parser.add_argument("--server-log", help="write backend output to this file")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.profile == "ramp":
+        schedule = ramp_schedule(args.duration, args.start_rps, args.peak_rps)
+    else:
+        schedule = burst_schedule(
+            args.duration,
+            args.base_rps,
+            args.burst_size,
+            args.burst_every,
+            args.burst_spread,
+        )
+    if args.replay:
+        messages = replayed_messages(args.replay, len(schedule))
+    else:
+        messages = synthetic_messages(len(schedule), args.mix, args.seed)
+    thresholds = [float(ms) for ms in args.thresholds.split(",")]
+
+    supabase = FakeSupabase(args.supabase_ms / 1000).start()
+    openai = FakeOpenAI(args.openai_ms / 1000).start()
+    twilio = FakeTwilio(args.twilio_ms / 1000).start()
+    env = backend_env(supabase, openai, twilio)
+    if args.async_replies:
+        env["WHATSAPP_ASYNC_REPLIES"] = "true"
+
+    print("WHATSAPP WEBHOOK LOAD TEST")
+    print("=" * 72)
+    print(
+        f"Profile: {args.profile}  Messages: {len(schedule)} over {args.duration:g}s  "
+        f"Workers: {args.workers}  Replies: {'async' if args.async_replies else 'inline'}"
+    )
+    print(
+        f"Supabase: {args.supabase_ms} ms  OpenAI: {args.openai_ms} ms  "
+        f"Twilio: {args.twilio_ms} ms"
+    )
+
+    with Backend(env, workers=args.workers, log_path=args.server_log) as backend:
+        start = time.perf_counter()
+        results = asyncio.run(
+            replay(backend.url, messages, schedule, args.timeout, args.max_connections)
+        )
+        elapsed = time.perf_counter() - start
+        summary = report(results, elapsed, thresholds)
+        if args.async_replies:
+            queued = sum(
+                r["outcome"] == "ok" and r["kind"] != "greeting" for r in results
+            )
+            asyncio.run(wait_for_deliveries(twilio, queued, limit=60))
+            summary["delivery"] = delivery_report(results, twilio)
+
+    for server in (supabase, openai, twilio):
+        server.stop()
+
+    print(
+        f"\n{'kind':<12}{'sent':>7}{'errors':>8}{'shed':>6}{'timeout':>9}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for kind, row in [*summary["by_kind"].items(), ("all", summary["overall"])]:
+        print(
+            f"{kind:<12}{row['requests']:>7}{row['errors']:>8}{row['shed']:>6}"
+            f"{row['timeout']:>9}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}"
+        )
+    overall = summary["overall"]
+    print(
+        f"\nError rate: {overall['error_rate']:.2%}  Max latency: {overall['max_ms']:.0f} ms  "
+        f"Generator lag: {overall['max_send_lag_ms']:.0f} ms"
+    )
+    print(
+        "Over threshold: "
+        + "  ".join(
+            f">{ms} ms: {count}" for ms, count in summary["threshold_breaches"].items()
+        )
+    )
+    if "delivery" in summary:
+        d = summary["delivery"]
+        print(
+            f"Replies delivered: {d['delivered']}/{d['queued']}  "
+            f"p50 {d['p50_ms']:.0f} ms  p95 {d['p95_ms']:.0f} ms  p99 {d['p99_ms']:.0f} ms"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "args": vars(args),
+                    **summary,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Cache Utilities for Know Your Local Offers
+In-process TTL + LRU cache with hit/miss counters, and a size-bounded on-disk LRU store
+"""
+
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a per-entry TTL.
+
+    Tuple keys are grouped by their first element (e.g. the method name) so
+    hit/miss counters can be reported per namespace.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        default_ttl: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._namespace_stats: Dict[Any, Dict[str, int]] = {}
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return a live entry (refreshing its LRU position) or `default`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._record(key, "hits")
+                    return value
+                del self._entries[key]
+            self._record(key, "misses")
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key satisfies `predicate`; returns the count"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache counters"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "namespaces": {
+                    name: dict(counts) for name, counts in self._namespace_stats.items()
+                },
+            }
+
+    def _record(self, key: Hashable, outcome: str) -> None:
+        if outcome == "hits":
+            self.hits += 1
+        else:
+            self.misses += 1
+        namespace = key[0] if isinstance(key, tuple) and key else None
+        counts = self._namespace_stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+
+class DiskCache:
+    """Size-bounded directory of blobs addressed by hex keys.
+
+    Files are evicted least recently used first once the directory grows
+    past `max_bytes`. Several processes may share one directory: each keeps
+    its own index, rebuilt from the files on disk (sizes and mtimes) when it
+    goes over budget and at least every `rescan_seconds`, so files written
+    by the others are counted and evicted too. Methods do blocking file
+    I/O; call them from a thread (e.g. `asyncio.to_thread`) when on the
+    event loop.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, rescan_seconds: float = 30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self._next_scan = 0.0
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            return None
+        # mtime doubles as the LRU timestamp across restarts
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process between the read and the touch
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # e.g. disk full: don't leave the partial file behind
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._forget(key)
+            self._sizes[key] = len(data)
+            self.total_bytes += len(data)
+            rescan = (
+                self.total_bytes > self.max_bytes or time.monotonic() >= self._next_scan
+            )
+        if rescan:
+            # Picks up files other processes wrote, and their LRU order
+            self._load_index()
+
+        with self._lock:
+            evicted = []
+            while self.total_bytes > self.max_bytes and self._sizes:
+                old_key, size = self._sizes.popitem(last=False)
+                self.total_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._sizes),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _forget(self, key: str) -> None:
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load_index(self) -> None:
+        """(Re)build the index from the directory, least recently used first"""
+        with self._lock:
+            # mtimes are coarse; files this process already tracks keep
+            # their exact relative order when timestamps tie
+            rank = {name: i for i, name in enumerate(self._sizes)}
+        entries = []
+        for shard in _scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in _scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process mid-scan
+                entries.append(
+                    (stat.st_mtime, rank.get(entry.name, -1), entry.name, stat.st_size)
+                )
+        sizes = OrderedDict((name, size) for *_, name, size in sorted(entries))
+        with self._lock:
+            self._sizes = sizes
+            self.total_bytes = sum(sizes.values())
+            self._next_scan = time.monotonic() + self.rescan_seconds
+
+
+def _scandir(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except FileNotFoundError:
+        return []
@@ -3,17 +3,29 @@ Chat Handler for Know Your Local Offers
 Handles AI-powered chat interactions for local business offers discovery
 """
 import os
-from openai import OpenAI
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional
 import re
 import asyncio
+from llm_client import LLMClient
+from shared_cache import SharedCache
+from response_cache import ResponseCache
+from gazetteer import Gazetteer
+from metrics import timed
+
+NON_OFFERS_REPLY = "I specialize in local offers and deals only. Please ask me about offers in your city, like 'gold offers in Kolhapur' or 'jewelry discounts in your area'."
 
 class ChatHandler:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, llm_client: LLMClient = None, db_service=None,
+                 shared_cache: SharedCache = None, gazetteer: Gazetteer = None):
+        # Shared async client so completions never block the event loop
+        self.llm = llm_client or LLMClient()
+        # Replies keyed by intent + offer fingerprint, optionally shared via Redis
+        self.response_cache = ResponseCache(shared_cache=shared_cache)
         # Import here to avoid circular imports
         from database_service import DatabaseService
-        self.db_service = DatabaseService()
+        self.db_service = db_service or DatabaseService()
+        # Cities, localities and categories from the data, refreshed in the background
+        self.gazetteer = gazetteer or Gazetteer(self.db_service)
         
         self.system_prompts: Dict[str, str] = {
             "en": (
@@ -26,60 +38,87 @@ class ChatHandler:
             ),
         }
 
-    async def generate_reply(self, text: str, language: str = "en") -> str:
+    @timed("chat.analyze")
+    def analyze(self, text: str) -> Dict:
+        """{"offers", "city", "category", "greeting"} for a message, in one pass"""
+        return self.gazetteer.analyze(text)
+
+    @timed("chat.generate_reply")
+    async def generate_reply(self, text: str, language: str = "en",
+                             analysis: Optional[Dict] = None) -> str:
         """Generate intelligent reply based on user query - ONLY for offers"""
         try:
+            # Callers that already analyzed the message pass the result along
+            analysis = analysis or self.analyze(text)
             # Only handle offers-related queries
-            if self._is_offers_query(text, language):
-                return await self._handle_offers_query(text, language)
+            if analysis["offers"]:
+                return await self._handle_offers_query(text, language, analysis)
             
             # Redirect non-offers queries
-            return "I specialize in local offers and deals only. Please ask me about offers in your city, like 'gold offers in Kolhapur' or 'jewelry discounts in your area'."
+            return NON_OFFERS_REPLY
             
         except Exception as e:
             print(f"[ChatHandler] Error in generate_reply: {e}")
             return "Sorry, there was a technical issue. Please try again with an offers query."
     
+    @timed("chat.stream_reply")
+    async def stream_reply(self, text: str, language: str = "en") -> AsyncIterator[str]:
+        """Like generate_reply, but yields the recommendation as it is generated"""
+        started = False
+        try:
+            analysis = self.analyze(text)
+            if not analysis["offers"]:
+                yield NON_OFFERS_REPLY
+                return
+
+            city, category = analysis["city"], analysis["category"]
+            offers = await self._search_offers_intelligently(text, city, category)
+            if not offers:
+                yield await self._generate_no_offers_response(city, category, language)
+                return
+
+            cached = await self.response_cache.lookup(text, city, category, offers)
+            if cached is not None:
+                yield cached
+                return
+
+            parts = []
+            async for delta in self.llm.stream(
+                model="gpt-4o-mini",
+                messages=self._build_offers_messages(text, offers),
+                temperature=0.7,
+                max_tokens=500
+            ):
+                parts.append(delta)
+                started = True
+                yield delta
+            await self.response_cache.store(text, city, category, offers, "".join(parts).strip())
+
+        except Exception as e:
+            print(f"[ChatHandler] Error in stream_reply: {e}")
+            if started:
+                # Part of the reply is already out; an apology would read as its ending
+                raise
+            yield "Sorry, there was a technical issue. Please try again with an offers query."
+    
     def _is_offers_query(self, text: str, language: str) -> bool:
         """Detect if the query is about offers/deals"""
-        offer_keywords_en = [
-            "offer", "offers", "deal", "deals", "discount", "discounts", "sale", "sales", 
-            "price", "prices", "cheap", "store", "stores", "shop", "shops", 
-            "jewellery", "jewelry", "gold", "diamond", "bangles", "rings", "buy",
-            "purchase", "shopping", "mall", "market", "latest", "best", "available",
-            "near", "local", "area", "city"
-        ]
-        text_lower = text.lower()
-        
-        # Check for offer-related keywords
-        if any(keyword in text_lower for keyword in offer_keywords_en):
-            return True
-        
-        # Check for location mentions (cities)
-        cities = ["kolhapur", "sangli", "pune", "mumbai"]
-        if any(city in text_lower for city in cities):
-            return True
-        
-        # Check for shopping-related terms
-        shopping_terms = ["what", "where", "show", "find", "get", "any", "available"]
-        if any(term in text_lower for term in shopping_terms):
-            return True
-            
-        return False
+        return self.analyze(text)["offers"]
     
-    async def _handle_offers_query(self, text: str, language: str) -> str:
+    async def _handle_offers_query(self, text: str, language: str,
+                                   analysis: Optional[Dict] = None) -> str:
         """Handle offers-related queries with database integration"""
         try:
             # Extract search parameters
-            city = self._extract_city(text)
-            category = self._extract_category(text)
+            analysis = analysis or self.analyze(text)
+            city, category = analysis["city"], analysis["category"]
             
             # Search for relevant offers
             offers = await self._search_offers_intelligently(text, city, category)
             
             if offers:
                 # Generate intelligent response with offers
-                return await self._generate_offers_response(text, offers, language)
+                return await self._generate_offers_response(text, offers, language, city, category)
             else:
                 # No offers found - provide helpful alternative response
                 return await self._generate_no_offers_response(city, category, language)
@@ -90,6 +129,7 @@ class ChatHandler:
     
 
     
+    @timed("chat.search_offers")
     async def _search_offers_intelligently(self, text: str, city: str, category: str) -> List[Dict]:
         """Intelligently search for offers based on query"""
         # Don't pass non-English text to search, use extracted parameters instead
@@ -97,28 +137,33 @@ class ChatHandler:
         if not any(ord(char) > 127 for char in text):  # Only if text is English
             search_query = text
         
-        # Try specific search first
-        offers = await self.db_service.search_offers(search_query, city, category, limit=5)
-        
-        if not offers and city:
-            # Try city-based search
-            offers = await self.db_service.get_offers_by_city(city, limit=5)
-        
-        if not offers and category:
-            # Try category-based search
-            offers = await self.db_service.get_offers_by_category(category, limit=5)
-        
-        if not offers:
-            # Get trending offers as fallback
-            offers = await self.db_service.get_trending_offers(limit=3)
-        
-        return offers
+        # One ranked lookup: query match > city > category > trending
+        return await self.db_service.get_ranked_offers(
+            search_query, city, category, limit=5, trending_limit=3
+        )
     
-    async def _generate_offers_response(self, query: str, offers: List[Dict], language: str) -> str:
+    @timed("chat.generate_offers_response")
+    async def _generate_offers_response(self, query: str, offers: List[Dict], language: str,
+                                        city: str = None, category: str = None) -> str:
         """Generate intelligent response with offers data"""
         if not offers:
             return await self._generate_no_offers_response(None, None, language)
-        
+
+        messages = self._build_offers_messages(query, offers)
+
+        async def complete() -> str:
+            return await self.llm.complete(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            )
+
+        # Rephrased questions about the same offers reuse one completion
+        return await self.response_cache.get_or_generate(query, city, category, offers, complete)
+
+    def _build_offers_messages(self, query: str, offers: List[Dict]) -> List[Dict[str, str]]:
+        """Build the recommendation prompt for a query and its offers"""
         offers_text = self._format_offers_for_display(offers)
         
         system_prompt = "You are a local offers specialist. Analyze the available offers and recommend the best deals based on value, location, and user needs. Focus only on shopping offers and deals."
@@ -138,17 +183,12 @@ class ChatHandler:
         Respond in English with clear recommendations about which offers provide the best value.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        return response.choices[0].message.content.strip()
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
     
+    @timed("chat.no_offers_response")
     async def _generate_no_offers_response(self, city: str, category: str, language: str) -> str:
         """Generate helpful response when no offers are found"""
         # Get available cities and categories for suggestions
@@ -166,31 +206,13 @@ class ChatHandler:
     
     def _extract_city(self, text: str) -> str:
         """Extract city from user query"""
-        city_mapping = {
-            "kolhapur": "Kolhapur",
-            "sangli": "Sangli", 
-            "pune": "Pune",
-            "mumbai": "Mumbai"
-        }
-        
-        text_lower = text.lower()
-        for key, value in city_mapping.items():
-            if key in text_lower:
-                return value
-        return None
+        return self.analyze(text)["city"]
     
     def _extract_category(self, text: str) -> str:
         """Extract category from user query"""
-        category_keywords = {
-            "jewellery": ["jewellery", "jewelry", "gold", "diamond", "bangles", "rings", "necklace", "silver"]
-        }
-        
-        text_lower = text.lower()
-        for category, keywords in category_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return category
-        return None
+        return self.analyze(text)["category"]
     
+    @timed("chat.format_offers")
     def _format_offers_for_display(self, offers: List[Dict]) -> str:
         """Format offers for LLM processing"""
         if not offers:
@@ -2,109 +2,267 @@
 Database Service for Know Your Local Offers
 Handles all database operations for offers, cities, and categories
 """
-from supabase_client import supabase
-from typing import List, Dict, Optional
+from supabase_repository import SupabaseRepository, RepositoryError
+from cache import TTLCache, MISSING
+from shared_cache import SharedCache, make_key
+from offer_catalog import OfferCatalog
+from metrics import timed
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 import asyncio
+import os
 import re
 
+def _quote(value: str) -> str:
+    """Quote a value for use inside a PostgREST or=() filter"""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+def _offer_affects(key: Tuple, offer: Dict) -> bool:
+    """Whether a cached read keyed (method, city, category, ...) could include `offer`"""
+    _, city, category = key[:3]
+    offer_city = (offer.get("city") or "").lower()
+    if city and city.lower() not in offer_city:
+        return False
+    if category and category != offer.get("category"):
+        return False
+    return True
+
+# Base score per ranked_offers() tier; the position within a tier adds < 1
+TIER_WEIGHTS = {"query": 4, "city": 3, "category": 2, "trending": 1}
+
 class DatabaseService:
-    def __init__(self):
-        self.supabase = supabase
-    
+    # Seconds each read method's results stay cached
+    CACHE_TTLS = {
+        "search_offers": 60,
+        "get_offers_by_city": 300,
+        "get_offers_by_category": 300,
+        "get_trending_offers": 120,
+        "get_ranked_offers": 60,
+    }
+
+    def __init__(self, repository: SupabaseRepository = None, cache: TTLCache = None,
+                 shared_cache: Optional[SharedCache] = None):
+        # Async repository: lookups never block the event loop and share one pool
+        self.repository = repository or SupabaseRepository()
+        # Read-through cache in front of the hot lookup methods
+        self.cache = cache or TTLCache(max_size=int(os.getenv("OFFERS_CACHE_SIZE", "512")))
+        # Optional Redis tier shared with the other workers
+        self.shared_cache = shared_cache
+        # Distinct cities/categories, reloaded periodically and bumped on write
+        self.catalog = OfferCatalog()
+        self.catalog_refresh_seconds = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+        self._catalog_lock = asyncio.Lock()
+        # Cleared if the search_offers / ranked_offers SQL functions have not been deployed
+        self.search_rpc_available = True
+        self.ranked_rpc_available = True
+
+    async def _cached(self, key: Tuple, loader: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Serve `key` from the local cache, then the shared cache, loading it on a miss"""
+        # Local entries remember the shared generation they were read under, so
+        # a write on another worker (which bumps it) retires them here too,
+        # within SharedCache.generation_ttl; the generation is kept locally
+        # for that long, so a local hit normally makes no Redis call. If
+        # Redis cannot be reached the generation is unknown (None) and the
+        # local cache is used as it would be without Redis.
+        generation = await self.shared_cache.generation("offers") if self.shared_cache else None
+        entry = self.cache.get(key)
+        if entry is not MISSING and (generation is None or entry[0] == generation):
+            return entry[1]
+
+        ttl = self.CACHE_TTLS[key[0]]
+        if self.shared_cache:
+            offers = await self.shared_cache.get_or_compute("offers", make_key(*key), loader, ttl)
+        else:
+            offers = await loader()
+        self.cache.set(key, (generation, offers), ttl=ttl)
+        return offers
+
+    @timed("db.search_offers")
     async def search_offers(self, query: str = "", city: str = None, category: str = None, limit: int = 10) -> List[Dict]:
         """Search for offers based on user query with intelligent filtering"""
         try:
-            # Build the base query
-            db_query = self.supabase.table("offers").select("*")
-            
-            # Apply filters
-            if city:
-                db_query = db_query.ilike("city", f"%{city}%")
-            
-            if category:
-                db_query = db_query.eq("category", category)
-            
-            # Search in multiple fields if query is provided
-            if query and query.strip():
-                # Clean the query
-                clean_query = query.strip().lower()
-                db_query = db_query.or_(
-                    f"offer_text.ilike.%{clean_query}%,"
-                    f"store_name.ilike.%{clean_query}%,"
-                    f"category.ilike.%{clean_query}%"
-                )
-            
-            # Add limit and order by validity
-            db_query = db_query.order("valid_till", desc=False).limit(limit)
-            
-            # Execute query
-            result = db_query.execute()
-            return result.data if result.data else []
-            
+            clean_query = (query or "").strip().lower()
+            return await self._cached(
+                ("search_offers", city, category, clean_query, limit),
+                lambda: self._search(clean_query, city, category, limit),
+            )
+
         except Exception as e:
             print(f"[DatabaseService] Search error: {e}")
             return []
-    
+
+    async def _search(self, query: str, city: str, category: str, limit: int) -> List[Dict]:
+        """Ranked, index-backed search with a plain filter fallback"""
+        if query and self.search_rpc_available:
+            try:
+                # search_offers() from database/migrations/002_offer_search.sql
+                return await self.repository.rpc("search_offers", {
+                    "search_query": query,
+                    "city_filter": city,
+                    "category_filter": category,
+                    "max_results": limit,
+                })
+            except RepositoryError as e:
+                if e.status_code != 404:
+                    raise
+                print("[DatabaseService] search_offers function missing, using ilike filters")
+                self.search_rpc_available = False
+
+        # Build the filters
+        filters = {}
+
+        # Apply filters
+        if city:
+            filters["city"] = f"ilike.*{city}*"
+
+        if category:
+            filters["category"] = f"eq.{category}"
+
+        # Search in multiple fields if query is provided
+        if query:
+            pattern = _quote(f"*{query}*")
+            filters["or"] = (
+                f"(offer_text.ilike.{pattern},"
+                f"store_name.ilike.{pattern},"
+                f"category.ilike.{pattern})"
+            )
+
+        # Add limit and order by validity
+        return await self.repository.select(
+            "offers", filters=filters, order="valid_till.asc", limit=limit
+        )
+
+    @timed("db.get_offers_by_city")
     async def get_offers_by_city(self, city: str, limit: int = 10) -> List[Dict]:
         """Get all offers for a specific city"""
         try:
-            result = (self.supabase.table("offers")
-                     .select("*")
-                     .ilike("city", f"%{city}%")
-                     .order("valid_till", desc=False)
-                     .limit(limit)
-                     .execute())
-            return result.data if result.data else []
+            return await self._city_offers(city, limit)
         except Exception as e:
             print(f"[DatabaseService] City search error: {e}")
             return []
-    
+
+    @timed("db.get_offers_by_category")
     async def get_offers_by_category(self, category: str, limit: int = 10) -> List[Dict]:
         """Get all offers for a specific category"""
         try:
-            result = (self.supabase.table("offers")
-                     .select("*")
-                     .eq("category", category)
-                     .order("valid_till", desc=False)
-                     .limit(limit)
-                     .execute())
-            return result.data if result.data else []
+            return await self._category_offers(category, limit)
         except Exception as e:
             print(f"[DatabaseService] Category search error: {e}")
             return []
-    
+
+    @timed("db.get_trending_offers")
     async def get_trending_offers(self, limit: int = 5) -> List[Dict]:
         """Get trending/popular offers"""
         try:
-            result = (self.supabase.table("offers")
-                     .select("*")
-                     .order("valid_till", desc=False)
-                     .limit(limit)
-                     .execute())
-            return result.data if result.data else []
+            return await self._trending_offers(limit)
         except Exception as e:
             print(f"[DatabaseService] Trending offers error: {e}")
             return []
-    
+
+    # Cached tier lookups that raise on failure; the public wrappers above
+    # turn errors into [], which _ranked must not mistake for "no offers"
+    async def _city_offers(self, city: str, limit: int) -> List[Dict]:
+        return await self._cached(
+            ("get_offers_by_city", city, None, limit),
+            lambda: self.repository.select(
+                "offers",
+                filters={"city": f"ilike.*{city}*"},
+                order="valid_till.asc",
+                limit=limit,
+            ),
+        )
+
+    async def _category_offers(self, category: str, limit: int) -> List[Dict]:
+        return await self._cached(
+            ("get_offers_by_category", None, category, limit),
+            lambda: self.repository.select(
+                "offers",
+                filters={"category": f"eq.{category}"},
+                order="valid_till.asc",
+                limit=limit,
+            ),
+        )
+
+    async def _trending_offers(self, limit: int) -> List[Dict]:
+        return await self._cached(
+            ("get_trending_offers", None, None, limit),
+            lambda: self.repository.select(
+                "offers", order="valid_till.asc", limit=limit
+            ),
+        )
+
+    @timed("db.get_ranked_offers")
+    async def get_ranked_offers(self, query: str = "", city: str = None, category: str = None,
+                                limit: int = 5, trending_limit: int = 3) -> List[Dict]:
+        """Best offers for a chat query in one round trip, tagged with the tier they matched"""
+        try:
+            clean_query = (query or "").strip().lower()
+            # The trending tier can include any offer, so no city/category scope for invalidation
+            return await self._cached(
+                ("get_ranked_offers", None, None, clean_query, city, category, limit, trending_limit),
+                lambda: self._ranked(clean_query, city, category, limit, trending_limit),
+            )
+        except Exception as e:
+            print(f"[DatabaseService] Ranked offers error: {e}")
+            return []
+
+    async def _ranked(self, query: str, city: str, category: str,
+                      limit: int, trending_limit: int) -> List[Dict]:
+        if self.ranked_rpc_available:
+            try:
+                # ranked_offers() from database/migrations/003_ranked_offers.sql
+                rows = await self.repository.rpc("ranked_offers", {
+                    "search_query": query,
+                    "city_filter": city,
+                    "category_filter": category,
+                    "max_results": limit,
+                    "trending_limit": trending_limit,
+                })
+                return [
+                    {**row["offer"], "match_tier": row["match_tier"], "match_score": row["match_score"]}
+                    for row in rows
+                ]
+            except RepositoryError as e:
+                if e.status_code != 404:
+                    raise
+                print("[DatabaseService] ranked_offers function missing, querying tiers one by one")
+                self.ranked_rpc_available = False
+
+        # Same tiers as separate queries. A failing tier raises, so an outage
+        # is never cached as an empty or lower-tier ranked result
+        offers, tier = await self._search(query, city, category, limit), "query"
+        if not offers and city:
+            offers, tier = await self._city_offers(city, limit), "city"
+        if not offers and category:
+            offers, tier = await self._category_offers(category, limit), "category"
+        if not offers:
+            offers, tier = await self._trending_offers(trending_limit), "trending"
+        return [
+            {**offer, "match_tier": tier, "match_score": TIER_WEIGHTS[tier] + 1.0 / (position + 1)}
+            for position, offer in enumerate(offers, 1)
+        ]
+
+    @timed("db.get_offers_by_price_range")
     async def get_offers_by_price_range(self, min_price: int = None, max_price: int = None) -> List[Dict]:
         """Get offers within a specific price range"""
         try:
             # This is a simplified version - you might need to adjust based on your price_range field format
-            query = self.supabase.table("offers").select("*")
-            
             # For now, we'll search in price_range text field
             # You could enhance this by parsing the price_range field
-            if min_price:
-                query = query.gte("price_range", f"₹{min_price}")
-            if max_price:
-                query = query.lte("price_range", f"₹{max_price}")
-            
-            result = query.execute()
-            return result.data if result.data else []
+            filters = {}
+            if min_price and max_price:
+                filters["and"] = f"(price_range.gte.{_quote(f'₹{min_price}')},price_range.lte.{_quote(f'₹{max_price}')})"
+            elif min_price:
+                filters["price_range"] = f"gte.₹{min_price}"
+            elif max_price:
+                filters["price_range"] = f"lte.₹{max_price}"
+
+            return await self.repository.select("offers", filters=filters)
         except Exception as e:
             print(f"[DatabaseService] Price range search error: {e}")
             return []
-    
+
+    @timed("db.add_offer")
     async def add_offer(self, offer_data: Dict) -> bool:
         """Add a new offer to the database"""
         try:
@@ -112,37 +270,92 @@ class DatabaseService:
             if not all(field in offer_data for field in required_fields):
                 print("[DatabaseService] Missing required fields for new offer")
                 return False
-            
-            result = self.supabase.table("offers").insert(offer_data).execute()
-            return bool(result.data)
+
+            result = await self.repository.insert("offers", offer_data)
+            if result:
+                self.catalog.record(offer_data)
+            # Drop cached reads whose city/category filters cover the new offer
+            self.cache.invalidate(lambda key: _offer_affects(key, offer_data))
+            if self.shared_cache:
+                await self.shared_cache.bump("offers")
+            return bool(result)
         except Exception as e:
             print(f"[DatabaseService] Add offer error: {e}")
             return False
-    
+
+    @timed("db.load_catalog")
+    async def _ensure_catalog(self) -> OfferCatalog:
+        """Load the city/category catalog if it is missing or stale"""
+        if not self.catalog.is_stale(self.catalog_refresh_seconds):
+            return self.catalog
+        async with self._catalog_lock:
+            if self.catalog.is_stale(self.catalog_refresh_seconds):
+                try:
+                    # Aggregate maintained by database/migrations/001_offer_catalog.sql
+                    self.catalog.load(await self.repository.select("offer_catalog"))
+                except RepositoryError as e:
+                    print(f"[DatabaseService] offer_catalog unavailable, scanning offers: {e}")
+                    self.catalog.load_offers(
+                        await self.repository.select("offers", columns="city,category")
+                    )
+        return self.catalog
+
+    @timed("db.get_cities")
     async def get_cities(self) -> List[str]:
         """Get list of all cities with offers"""
         try:
-            result = (self.supabase.table("offers")
-                     .select("city")
-                     .execute())
-            if result.data:
-                cities = list(set(item["city"] for item in result.data if item.get("city")))
-                return sorted(cities)
-            return []
+            return (await self._ensure_catalog()).cities()
         except Exception as e:
             print(f"[DatabaseService] Get cities error: {e}")
             return []
-    
+
+    @timed("db.get_categories")
     async def get_categories(self) -> List[str]:
         """Get list of all categories with offers"""
         try:
-            result = (self.supabase.table("offers")
-                     .select("category")
-                     .execute())
-            if result.data:
-                categories = list(set(item["category"] for item in result.data if item.get("category")))
-                return sorted(categories)
-            return []
+            return (await self._ensure_catalog()).categories()
         except Exception as e:
             print(f"[DatabaseService] Get categories error: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @timed("db.get_city_counts")
+    async def get_city_counts(self) -> Dict[str, int]:
+        """Get the number of offers per city"""
+        try:
+            return (await self._ensure_catalog()).city_counts()
+        except Exception as e:
+            print(f"[DatabaseService] Get city counts error: {e}")
+            return {}
+
+    @timed("db.get_category_counts")
+    async def get_category_counts(self) -> Dict[str, int]:
+        """Get the number of offers per category"""
+        try:
+            return (await self._ensure_catalog()).category_counts()
+        except Exception as e:
+            print(f"[DatabaseService] Get category counts error: {e}")
+            return {}
+
+    @timed("db.get_place_aliases")
+    async def get_place_aliases(self) -> List[Dict]:
+        """Alias rows {"alias", "kind", "value"} for the chat gazetteer"""
+        try:
+            # Table from database/migrations/004_place_aliases.sql
+            return await self.repository.select("place_aliases", columns="alias,kind,value")
+        except Exception as e:
+            print(f"[DatabaseService] Get place aliases error: {e}")
+            return []
+
+    @timed("db.get_business_places")
+    async def get_business_places(self) -> List[Dict]:
+        """Distinct (city, category) pairs of businesses, including ones without offers"""
+        try:
+            # View from database/migrations/005_business_places.sql
+            return await self.repository.select("business_places", columns="city,category")
+        except Exception as e:
+            print(f"[DatabaseService] Get business places error: {e}")
+            return []
+
+    async def close(self) -> None:
+        """Release pooled database connections"""
+        await self.repository.aclose()
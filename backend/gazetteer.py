@@ -0,0 +1,121 @@
+"""
+Gazetteer for Know Your Local Offers
+In-memory cities, localities, aliases and categories built from the offers data and refreshed in the background
+"""
+
+import os
+import time
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from intent_matcher import CATEGORIES, CITIES, IntentMatcher
+from metrics import timed
+
+
+def build_snapshot(
+    offer_cities: Iterable[str],
+    offer_categories: Iterable[str],
+    businesses: Iterable[Dict] = (),
+    aliases: Iterable[Dict] = (),
+) -> Dict:
+    """Matcher plus display lists for one version of the data.
+
+    Names from the data come first so they win over the built-in seed
+    vocabulary, e.g. "gold" maps to a "gold" category once one exists.
+    """
+    offer_cities = sorted(set(offer_cities))
+    offer_categories = sorted(set(offer_categories))
+
+    cities = {city.lower(): city for city in offer_cities}
+    categories: Dict[str, List[str]] = {c: [c] for c in offer_categories}
+    for business in businesses:
+        if business.get("city"):
+            cities.setdefault(business["city"].lower(), business["city"])
+        if business.get("category"):
+            categories.setdefault(business["category"], [business["category"]])
+    for row in aliases:
+        if not row.get("alias") or not row.get("value"):
+            continue
+        if row.get("kind") == "city":
+            cities.setdefault(row["alias"].lower(), row["value"])
+        elif row.get("kind") == "category":
+            categories.setdefault(row["value"], []).append(row["alias"])
+
+    for alias, city in CITIES.items():
+        cities.setdefault(alias, city)
+    for category, keywords in CATEGORIES.items():
+        categories.setdefault(category, []).extend(keywords)
+
+    return {
+        "matcher": IntentMatcher(cities=cities, categories=categories),
+        # What the welcome message advertises: places that have offers
+        "cities": offer_cities or sorted(set(CITIES.values())),
+        "categories": offer_categories or sorted(CATEGORIES),
+    }
+
+
+class Gazetteer:
+    """Current vocabulary for message analysis, swapped in whole on refresh.
+
+    Readers only ever touch `self._snapshot`, which a refresh replaces with
+    a single assignment once the new matcher is fully built, so a message
+    is always analyzed against one consistent version and never waits on
+    the database. Until the first load finishes the built-in vocabulary
+    is used.
+    """
+
+    def __init__(self, db_service, refresh_seconds: Optional[float] = None):
+        self.db_service = db_service
+        self.refresh_seconds = refresh_seconds or float(
+            os.getenv("GAZETTEER_REFRESH_SECONDS", "300")
+        )
+        self._snapshot = build_snapshot([], [])
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at = None
+
+    def analyze(self, text: str) -> Dict:
+        return self._snapshot["matcher"].analyze(text)
+
+    def cities(self) -> List[str]:
+        return self._snapshot["cities"]
+
+    def categories(self) -> List[str]:
+        return self._snapshot["categories"]
+
+    @timed("gazetteer.refresh")
+    async def refresh(self) -> None:
+        """Reload from the database and swap in the new vocabulary"""
+        cities, categories, businesses, aliases = await asyncio.gather(
+            self.db_service.get_cities(),
+            self.db_service.get_categories(),
+            self.db_service.get_business_places(),
+            self.db_service.get_place_aliases(),
+        )
+        if not (cities or categories or businesses or aliases):
+            # Keep serving the previous version rather than an empty one
+            print("[Gazetteer] no data loaded, keeping the current vocabulary")
+            return
+        # Compiling the regex is CPU work; keep it off the event loop
+        self._snapshot = await asyncio.to_thread(
+            build_snapshot, cities, categories, businesses, aliases
+        )
+        self.loaded_at = time.time()
+
+    def start(self) -> None:
+        """Load now and keep refreshing in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[Gazetteer] refresh error: {e}")
+            await asyncio.sleep(self.refresh_seconds)
@@ -0,0 +1,153 @@
+"""
+Intent Matcher for Know Your Local Offers
+Single-pass detection of offers intent, city and category with one precompiled regex
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Words that make a message an offers query
+OFFER_KEYWORDS = tuple("""
+    offer deal discount sale price cheap store shop jewellery jewelry gold
+    diamond bangle ring buy purchase shopping mall market latest best
+    available near local area city
+    """.split())
+
+# Question words that usually mean the user is looking for something
+SHOPPING_TERMS = tuple("what where show find get any".split())
+
+# Openers that get the welcome message
+GREETINGS = tuple("hi hello hey start help namaste".split())
+
+# Spelling in the message -> canonical city name
+CITIES = {
+    "kolhapur": "Kolhapur",
+    "sangli": "Sangli",
+    "pune": "Pune",
+    "mumbai": "Mumbai",
+}
+
+# Category -> words that imply it
+CATEGORIES = {
+    "jewellery": tuple("""
+        jewellery jewelry gold diamond bangle ring earring necklace silver
+        """.split()),
+}
+
+
+def _variants(term: str) -> Tuple[str, ...]:
+    """The term plus its plural, so "offers" and "rings" match too"""
+    if term.endswith(("s", "x", "ch", "sh")):
+        return (term, term + "es")
+    if term.endswith("y") and term[-2:-1] not in "aeiou":
+        return (term, term[:-1] + "ies")
+    return (term, term + "s")
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Regex for a set of terms, factored on shared prefixes.
+
+    re tries the branches of a flat alternation one after another, so a
+    flat list of a few hundred words is slow; nesting them by prefix means
+    each character of the message is compared against one branch per level.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: Dict) -> str:
+    branches = [
+        (r"\s+" if char == " " else re.escape(char)) + _node_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    if "" in node:
+        # A term ends here; the longer terms are optional (greedy, so tried first)
+        return "(?:" + "|".join(branches) + ")?"
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+class IntentMatcher:
+    """Matches every vocabulary in one left-to-right scan of the message.
+
+    All terms (keywords, city aliases, category words and their plurals)
+    are compiled into one prefix-factored regex with word boundaries, and
+    each match is looked up in a table that says what the term implies:
+    offers intent, a city, a category, or several at once. Terms inside
+    longer words ("get" in "together") never match.
+    """
+
+    def __init__(
+        self,
+        offer_keywords: Iterable[str] = OFFER_KEYWORDS + SHOPPING_TERMS,
+        cities: Optional[Dict[str, str]] = None,
+        categories: Optional[Dict[str, Iterable[str]]] = None,
+        greetings: Iterable[str] = GREETINGS,
+    ):
+        cities = CITIES if cities is None else cities
+        categories = CATEGORIES if categories is None else categories
+
+        # term -> (offers intent, city, category, greeting); the first value given wins
+        self._terms: Dict[str, Tuple] = {}
+        for keyword in offer_keywords:
+            self._add(keyword, offers=True)
+        for greeting in greetings:
+            self._add(greeting, greeting=True)
+        for alias, city in cities.items():
+            # Naming a city is enough to count as an offers query
+            self._add(alias, offers=True, city=city)
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._add(keyword, category=category)
+
+        self._multiword = any(" " in term for term in self._terms)
+        self.pattern = re.compile(
+            r"\b" + _trie_pattern(self._terms) + r"\b" if self._terms else r"(?!)"
+        )
+
+    def _add(
+        self,
+        term: str,
+        offers: bool = False,
+        city: str = None,
+        category: str = None,
+        greeting: bool = False,
+    ) -> None:
+        term = " ".join(term.lower().split())
+        if not term:
+            return
+        for variant in _variants(term):
+            old = self._terms.get(variant, (False, None, None, False))
+            self._terms[variant] = (
+                old[0] or offers,
+                old[1] or city,
+                old[2] or category,
+                old[3] or greeting,
+            )
+
+    def analyze(self, text: str) -> Dict:
+        """{"offers", "city", "category", "greeting"}; the first city/category mentioned wins"""
+        offers, city, category, greeting = False, None, None, False
+        for term in self.pattern.findall(text.lower()):
+            if self._multiword:
+                term = " ".join(term.split())
+            found = self._terms[term]
+            offers = offers or found[0]
+            city = city or found[1]
+            category = category or found[2]
+            greeting = greeting or found[3]
+        return {
+            "offers": offers,
+            "city": city,
+            "category": category,
+            "greeting": greeting,
+        }
@@ -0,0 +1,102 @@
+"""
+LLM Client for Know Your Local Offers
+Async OpenAI wrapper with a shared connection pool, concurrency limit and per-call timeouts
+"""
+
+import os
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from metrics import timed
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("LLM_MAX_CONCURRENCY", "32")
+        )
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "30"))
+        max_connections = max_connections or int(
+            os.getenv("LLM_MAX_CONNECTIONS", str(self.max_concurrency))
+        )
+
+        # One pooled HTTP client for every completion made by this worker
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=self.http_client,
+            max_retries=1,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @timed("openai.complete")
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Run a chat completion without blocking the event loop"""
+        call_timeout = timeout or self.timeout
+        async with self._semaphore:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=call_timeout,
+                ),
+                timeout=call_timeout,
+            )
+        return (response.choices[0].message.content or "").strip()
+
+    @timed("openai.stream")
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas as they arrive"""
+        call_timeout = timeout or self.timeout
+        async with self._semaphore:
+            stream = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=call_timeout,
+                    stream=True,
+                ),
+                timeout=call_timeout,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections"""
+        await self.http_client.aclose()
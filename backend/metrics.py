@@ -0,0 +1,209 @@
+"""
+Metrics for Know Your Local Offers
+Per-stage latency histograms, in-flight gauges and cache counters in Prometheus format
+"""
+
+import time
+import inspect
+import functools
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        Gauge,
+        Histogram,
+        generate_latest,
+    )
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:  # prometheus_client is optional; without it nothing is recorded
+    REGISTRY = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Spans in-process work (~1ms) up to slow OCR and LLM calls (~30s+)
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+
+if REGISTRY is not None:
+    STAGE_SECONDS = Histogram(
+        "klo_stage_seconds",
+        "Time spent in one stage of request handling",
+        ["stage"],
+        buckets=LATENCY_BUCKETS,
+    )
+    STAGE_IN_FLIGHT = Gauge(
+        "klo_stage_in_flight", "Calls currently inside a stage", ["stage"]
+    )
+    HTTP_SECONDS = Histogram(
+        "klo_http_request_seconds",
+        "HTTP request latency by route",
+        ["method", "route", "status"],
+        buckets=LATENCY_BUCKETS,
+    )
+    HTTP_IN_FLIGHT = Gauge(
+        "klo_http_requests_in_flight", "HTTP requests being handled", ["route"]
+    )
+
+
+def enabled() -> bool:
+    return REGISTRY is not None
+
+
+def timed(stage: str) -> Callable:
+    """Record a function's latency and concurrency under `stage`.
+
+    Works on coroutines, async generators (timed until exhausted or closed)
+    and plain functions. A no-op when prometheus_client is not installed.
+    """
+
+    def decorate(func: Callable) -> Callable:
+        if REGISTRY is None:
+            return func
+        observe = STAGE_SECONDS.labels(stage).observe
+        in_flight = STAGE_IN_FLIGHT.labels(stage)
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def stream_wrapper(*args, **kwargs):
+                in_flight.inc()
+                start = time.perf_counter()
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                finally:
+                    observe(time.perf_counter() - start)
+                    in_flight.dec()
+
+            return stream_wrapper
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                in_flight.inc()
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(time.perf_counter() - start)
+                    in_flight.dec()
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - start)
+                in_flight.dec()
+
+        return sync_wrapper
+
+    return decorate
+
+
+class CacheCollector:
+    """Reads hit/miss counters from the app's caches at scrape time.
+
+    The caches already count their own hits and misses, so nothing is
+    added to the lookup path; a scrape costs one `stats()` call per cache.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, Any] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def add_cache(self, name: str, cache: Any) -> None:
+        """`cache.stats()` must return hits/misses, optionally per namespace"""
+        self._caches[name] = cache
+
+    def add_gauges(
+        self, name: str, documentation: str, read: Callable[[], Dict[str, float]]
+    ) -> None:
+        """Expose `read()`'s {label: value} as klo_<name>{item=label}"""
+        self._gauges[name] = (documentation, read)
+
+    def collect(self) -> Iterable:
+        requests = CounterMetricFamily(
+            "klo_cache_requests",
+            "Cache lookups by cache, namespace and result",
+            labels=["cache", "namespace", "result"],
+        )
+        size = GaugeMetricFamily(
+            "klo_cache_entries", "Entries held by a cache", labels=["cache"]
+        )
+        for name, cache in self._caches.items():
+            stats = cache.stats()
+            namespaces = stats.get("namespaces") or {
+                "": {"hits": stats.get("hits", 0), "misses": stats.get("misses", 0)}
+            }
+            for namespace, counts in namespaces.items():
+                for result in ("hits", "misses"):
+                    requests.add_metric(
+                        [name, str(namespace or ""), result], counts.get(result, 0)
+                    )
+            entries = stats.get("size", stats.get("files"))
+            if entries is not None:
+                size.add_metric([name], entries)
+        yield requests
+        yield size
+
+        for name, (documentation, read) in self._gauges.items():
+            family = GaugeMetricFamily(f"klo_{name}", documentation, labels=["item"])
+            for item, value in read().items():
+                family.add_metric([item], value)
+            yield family
+
+
+class MetricsMiddleware:
+    """Request latency and in-flight gauges per route template.
+
+    Paths that match no route are grouped under "other" so scanners
+    cannot blow up label cardinality.
+    """
+
+    def __init__(self, app, routes: Optional[Iterable[str]] = None):
+        self.app = app
+        self.routes = set(routes or [])
+
+    async def __call__(self, scope, receive, send):
+        if REGISTRY is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"] if scope["path"] in self.routes else "other"
+        status = "500"
+
+        async def tracked_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, tracked_send)
+        finally:
+            HTTP_SECONDS.labels(scope["method"], route, status).observe(
+                time.perf_counter() - start
+            )
+            in_flight.dec()
+
+
+def register(collector: CacheCollector) -> None:
+    if REGISTRY is not None:
+        REGISTRY.register(collector)
+
+
+def render() -> bytes:
+    """Everything in the default registry, in the Prometheus text format"""
+    return generate_latest(REGISTRY)
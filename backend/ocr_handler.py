@@ -1,26 +1,312 @@
 """
 OCR Handler for Know Your Local Offers
-Handles text extraction from images using EasyOCR
+Handles text extraction from images using EasyOCR in a pool of worker processes
 """
-import easyocr
-import numpy as np
-from PIL import Image
+import os
 import io
+import json
+import asyncio
+import hashlib
+import tempfile
+import time
+import zipfile
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Tuple, Union
+from cache import TTLCache, DiskCache, MISSING
+from metrics import timed
+
+# Per-process EasyOCR model, loaded on first use (or at worker start when warming)
+_reader = None
+
+def _get_reader():
+    global _reader
+    if _reader is None:
+        import easyocr
+        # CPU fallback
+        _reader = easyocr.Reader(["en"], gpu=False)
+    return _reader
+
+def _warm_worker():
+    """Pool initializer: load the model before the first request arrives"""
+    _get_reader()
+
+def default_settings() -> dict:
+    """Pre-processing settings, tunable through the environment"""
+    return {
+        "max_side": int(os.getenv("OCR_MAX_SIDE", "1600")),
+        "grayscale": os.getenv("OCR_GRAYSCALE", "true").lower() == "true",
+        "autocontrast": os.getenv("OCR_AUTOCONTRAST", "true").lower() == "true",
+    }
+
+def preprocess_image(image_bytes: bytes, max_side: int = 1600, grayscale: bool = True,
+                     autocontrast: bool = True):
+    """Decode, orient, downscale and normalise an image for readtext"""
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(image_bytes))
+    scale = max_side / max(img.size) if max_side else 1
+    if scale < 1:
+        # JPEG only: decode straight at the smallest DCT scale still >= the target
+        img.draft("L" if grayscale else "RGB",
+                  (int(img.width * scale) + 1, int(img.height * scale) + 1))
+    # Phone photos store rotation in EXIF rather than in the pixels
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("L" if grayscale else "RGB")
+    if max_side:
+        # Never upscales; keeps the aspect ratio
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    if autocontrast:
+        img = ImageOps.autocontrast(img, cutoff=1)
+    return np.asarray(img)
+
+def _run_ocr(image_bytes: bytes, settings: dict = None) -> str:
+    """Runs inside a worker process"""
+    arr = preprocess_image(image_bytes, **(settings or {}))
+    results = _get_reader().readtext(arr)
+    texts = [t for (_, t, p) in results if p > 0.5]
+    if not texts:
+        return "No text could be extracted from the image."
+    return " ".join(texts)
+
+def _run_ocr_shared(name: str, size: int, settings: dict = None) -> str:
+    """Runs inside a worker process, on an image the parent left in shared memory"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        with block.buf[:size] as image:
+            return _run_ocr(image, settings)
+    finally:
+        block.close()
+
+def _free_block(block: shared_memory.SharedMemory) -> None:
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+def expand_images(name: str, data: Union[bytes, BinaryIO], max_images: int, max_image_bytes: int,
+                  max_total_bytes: int = None) -> List[Tuple[str, bytes]]:
+    """Return [(name, bytes)] for an image upload, or for each image inside a zip.
+
+    `data` may be bytes or a seekable file such as a spooled upload; a zip is
+    read member by member straight from it rather than copied into memory.
+    Sizes come from the zip headers and are checked before anything is
+    decompressed (zipfile never yields more than the header's file_size), so
+    a small archive cannot expand past `max_total_bytes`.
+    """
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    source.seek(0)
+    if max_total_bytes is None:
+        max_total_bytes = max_images * max_image_bytes
+    if not zipfile.is_zipfile(source):
+        source.seek(0)
+        image = source.read(max_image_bytes + 1)
+        if len(image) > max_image_bytes or len(image) > max_total_bytes:
+            raise ValueError(f"{name} exceeds {min(max_image_bytes, max_total_bytes)} bytes")
+        return [(name, image)]
+    images, total = [], 0
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > max_image_bytes:
+                raise ValueError(f"{info.filename} exceeds {max_image_bytes} bytes")
+            if len(images) >= max_images:
+                raise ValueError(f"archive has more than {max_images} images")
+            total += info.file_size
+            if total > max_total_bytes:
+                raise ValueError(f"images in {name} exceed {max_total_bytes} bytes uncompressed")
+            images.append((f"{name}/{info.filename}", archive.read(info)))
+    return images
 
 class OCRHandler:
-    def __init__(self):
-        # only load once, CPU fallback
-        self.reader = easyocr.Reader(["en"], gpu=False)
+    def __init__(self, max_workers: int = None, max_pending: int = None,
+                 queue_timeout: float = None, timeout: float = None, warm: bool = None,
+                 cache_dir: str = None):
+        self.max_workers = max_workers or int(os.getenv("OCR_WORKERS", str(min(2, os.cpu_count() or 1))))
+        # Images handed to the pool at once; further requests wait for a slot
+        self.max_pending = max_pending or int(os.getenv("OCR_MAX_PENDING", str(self.max_workers * 2)))
+        self.queue_timeout = queue_timeout or float(os.getenv("OCR_QUEUE_TIMEOUT", "30"))
+        self.timeout = timeout or float(os.getenv("OCR_TIMEOUT", "60"))
+        self.warm = warm if warm is not None else os.getenv("OCR_WARM_WORKERS", "false").lower() == "true"
+        self.settings = default_settings()
+        self._pool = None
+        self._slots = asyncio.Semaphore(self.max_pending)
+        # Images one batch may have in the pool at once; kept below max_pending
+        # so single-image requests still get slots while a batch is running
+        self.batch_concurrency = int(os.getenv("OCR_BATCH_CONCURRENCY", str(max(1, self.max_pending // 2))))
+        # Results keyed by image content + settings: memory LRU in front of a disk store
+        self.cache = TTLCache(
+            max_size=int(os.getenv("OCR_CACHE_SIZE", "256")),
+            default_ttl=float(os.getenv("OCR_CACHE_TTL", "86400")),
+        )
+        self.disk_cache = DiskCache(
+            cache_dir or os.getenv("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "klo-ocr-cache")),
+            max_bytes=int(os.getenv("OCR_CACHE_MAX_MB", "64")) * 1024 * 1024,
+        )
+
+    def cache_key(self, image_bytes: Union[bytes, memoryview]) -> str:
+        """Content address of an image under the current OCR settings"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(self.settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the app never loads the model, and
+        # again after a worker crash has broken the previous pool
+        if self._pool is None:
+            self._pool = self._new_pool()
+        return self._pool
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker if self.warm else None,
+        )
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next job starts a fresh one"""
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, pool: ProcessPoolExecutor, image) -> Tuple[Future, Optional[shared_memory.SharedMemory]]:
+        """Hand an image to the pool without an intermediate copy.
+
+        bytes are pickled to the worker as they are. Any other buffer, such
+        as a memory-mapped upload, is copied once into a shared memory block
+        that the worker reads in place; the caller frees the block when the
+        job is done.
+        """
+        if isinstance(image, bytes):
+            return pool.submit(_run_ocr, image, self.settings), None
+        size = len(image)
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            block.buf[:size] = image
+            return pool.submit(_run_ocr_shared, block.name, size, self.settings), block
+        except BaseException:
+            _free_block(block)
+            raise
+
+    def _release_slot(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Called from the pool's thread when a job finishes, however it ended"""
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            pass  # event loop already closed at shutdown
+
+    def start(self) -> None:
+        """Spawn the workers ahead of the first request when warming is enabled"""
+        if self.warm:
+            pool = self._get_pool()
+            for _ in range(self.max_workers):
+                pool.submit(_warm_worker)
+
+    async def extract_text(self, image_bytes: Union[bytes, memoryview]) -> str:
+        text, _ = await self.extract_text_result(image_bytes)
+        return text
+
+    @timed("ocr.extract_text")
+    async def extract_text_result(self, image_bytes: Union[bytes, memoryview]) -> Tuple[str, bool]:
+        """OCR any buffer; returns (text, succeeded). Only copied to cross to a worker"""
+        key = self.cache_key(image_bytes)
+        text = self.cache.get(key)
+        if text is not MISSING:
+            return text, True
+        cached = await asyncio.to_thread(self.disk_cache.get, key)
+        if cached is not None:
+            text = cached.decode("utf-8")
+            self.cache.set(key, text)
+            return text, True
+
+        text, ok = await self._run_in_pool(image_bytes)
+        if ok:
+            # Errors and timeouts are not cached
+            self.cache.set(key, text)
+            try:
+                await asyncio.to_thread(self.disk_cache.set, key, text.encode("utf-8"))
+            except OSError as e:
+                # Disk full, read-only volume...: the result is still good
+                print(f"[OCRHandler] disk cache write failed: {e}")
+        return text, ok
+
+    @timed("ocr.extract_batch")
+    async def extract_batch(self, images: List[Tuple[str, bytes]]) -> AsyncIterator[Dict]:
+        """Fan images out across the pool, yielding each result as it finishes"""
+        # A batch uses at most batch_concurrency of the max_pending pool slots
+        in_flight = asyncio.Semaphore(self.batch_concurrency)
+
+        async def run(index: int, name: str, data: bytes) -> Dict:
+            async with in_flight:
+                start = time.perf_counter()
+                text = await self.extract_text(data)
+                return {
+                    "index": index,
+                    "name": name,
+                    "text": text,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                }
 
-    async def extract_text(self, image_bytes: bytes) -> str:
+        tasks = [asyncio.create_task(run(i, name, data)) for i, (name, data) in enumerate(images)]
         try:
-            img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            arr = np.array(img)
-            results = self.reader.readtext(arr)
-            texts = [t for (_, t, p) in results if p > 0.5]
-            if not texts:
-                return "No text could be extracted from the image."
-            return " ".join(texts)
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @timed("ocr.worker")
+    async def _run_in_pool(self, image_bytes: Union[bytes, memoryview]) -> Tuple[str, bool]:
+        """Run OCR in the worker pool; returns (text, succeeded)"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            print("[OCRHandler] queue full, request timed out waiting for a worker")
+            return "OCR service is busy. Please try again shortly.", False
+
+        # The slot is held until the job itself finishes, not until we stop
+        # waiting for it: a timed-out job keeps its worker busy, and counting
+        # it keeps max_pending an honest bound on the work in the pool
+        loop = asyncio.get_running_loop()
+        pool = None
+        try:
+            pool = self._get_pool()
+            job, block = self._submit(pool, image_bytes)
         except Exception as e:
+            self._slots.release()
+            if pool is not None and isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
             print(f"[OCRHandler] error: {e}")
-            return f"Error processing image: {e}"
\ No newline at end of file
+            return f"Error processing image: {e}", False
+        if block is not None:
+            # Kept until the worker is done with it, even if we stop waiting
+            job.add_done_callback(lambda _: _free_block(block))
+        job.add_done_callback(lambda _: self._release_slot(loop))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), timeout=self.timeout), True
+        except asyncio.TimeoutError:
+            print(f"[OCRHandler] OCR took longer than {self.timeout}s")
+            return "Timed out while processing image.", False
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); the pool refuses all further jobs
+            print(f"[OCRHandler] worker pool broke, restarting it: {e}")
+            self._discard_pool(pool)
+            return "Error processing image: OCR worker crashed.", False
+        except Exception as e:
+            print(f"[OCRHandler] error: {e}")
+            return f"Error processing image: {e}", False
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
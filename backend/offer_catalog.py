@@ -0,0 +1,67 @@
+"""
+Offer Catalog for Know Your Local Offers
+In-process index of distinct cities and categories with their offer counts
+"""
+
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List
+
+
+class OfferCatalog:
+    """Distinct city/category values with offer counts, updated incrementally.
+
+    Reads cost O(distinct values). The catalog is (re)loaded from the
+    `offer_catalog` aggregate table and bumped in place for every offer this
+    worker writes; `is_stale` tells the owner when to reload so writes made
+    by other workers are eventually picked up.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._cities: Counter = Counter()
+        self._categories: Counter = Counter()
+        self.loaded_at = None
+
+    def load(self, rows: Iterable[Dict]) -> None:
+        """Replace the catalog with rows of {"kind", "value", "offer_count"}"""
+        cities, categories = Counter(), Counter()
+        for row in rows:
+            target = cities if row.get("kind") == "city" else categories
+            if row.get("value"):
+                target[row["value"]] += int(row.get("offer_count") or 0)
+        self._cities, self._categories = cities, categories
+        self.loaded_at = self._clock()
+
+    def load_offers(self, offers: Iterable[Dict]) -> None:
+        """Build the catalog by counting raw offer rows"""
+        cities, categories = Counter(), Counter()
+        for offer in offers:
+            if offer.get("city"):
+                cities[offer["city"]] += 1
+            if offer.get("category"):
+                categories[offer["category"]] += 1
+        self._cities, self._categories = cities, categories
+        self.loaded_at = self._clock()
+
+    def record(self, offer: Dict) -> None:
+        """Count a newly written offer"""
+        if offer.get("city"):
+            self._cities[offer["city"]] += 1
+        if offer.get("category"):
+            self._categories[offer["category"]] += 1
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.loaded_at is None or self._clock() - self.loaded_at >= max_age
+
+    def cities(self) -> List[str]:
+        return sorted(city for city, count in self._cities.items() if count > 0)
+
+    def categories(self) -> List[str]:
+        return sorted(cat for cat, count in self._categories.items() if count > 0)
+
+    def city_counts(self) -> Dict[str, int]:
+        return {city: self._cities[city] for city in self.cities()}
+
+    def category_counts(self) -> Dict[str, int]:
+        return {cat: self._categories[cat] for cat in self.categories()}
@@ -0,0 +1,150 @@
+"""
+Response Cache for Know Your Local Offers
+Reuses generated offer recommendations across equivalent questions about the same offers
+"""
+
+import os
+import re
+import json
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import MISSING, TTLCache
+from shared_cache import SharedCache, make_key
+
+# Words that do not change what the user is asking for. Qualifiers such as
+# "cheap", "best", "latest" or "sale" change which offers the reply should
+# pick, so they stay in the key; "offer" and "deal" are how users name every
+# result and carry no preference.
+FILLER_WORDS = set("""
+    a about all an and any are area at available buy can city deal do find for
+    from get give have i in is list local me my near nearby need of offer on or
+    please purchase shop shopping show some store tell the there to want what
+    where which with you
+    """.split())
+
+# Offer fields that end up in the LLM prompt
+PROMPT_FIELDS = (
+    "id",
+    "store_name",
+    "city",
+    "offer_text",
+    "price_range",
+    "valid_till",
+    "category",
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def intent_key(query: str, city: Optional[str], category: Optional[str]) -> Tuple:
+    """Normalised (city, category, terms) so rephrasings of a question collide"""
+    city_tokens = set(TOKEN_PATTERN.findall(city.lower())) if city else set()
+    terms = {
+        _singular(token)
+        for token in TOKEN_PATTERN.findall(query.lower())
+        if token not in city_tokens
+    }
+    terms -= FILLER_WORDS
+    return (
+        city.lower() if city else None,
+        category.lower() if category else None,
+        tuple(sorted(terms)),
+    )
+
+
+def offers_fingerprint(offers: List[Dict]) -> str:
+    """Hash of exactly the offer data the prompt is built from"""
+    rows = [[offer.get(field) for field in PROMPT_FIELDS] for offer in offers]
+    raw = json.dumps(rows, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Recommendation cache keyed by (intent, offer fingerprint).
+
+    Two questions with the same city, category and meaningful terms share a
+    reply, but only while the offers fed to the prompt are byte-for-byte the
+    same; any change to those offers changes the fingerprint and forces a
+    fresh completion.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        shared_cache: Optional[SharedCache] = None,
+    ):
+        self.ttl = ttl or float(os.getenv("REPLY_CACHE_TTL", "600"))
+        self.cache = TTLCache(
+            max_size=max_size or int(os.getenv("REPLY_CACHE_SIZE", "1024")),
+            default_ttl=self.ttl,
+        )
+        self.shared_cache = shared_cache
+
+    async def lookup(
+        self,
+        query: str,
+        city: Optional[str],
+        category: Optional[str],
+        offers: List[Dict],
+    ) -> Optional[str]:
+        """Cached reply for this question and offer set, or None"""
+        key = self._key(query, city, category, offers)
+        reply = self.cache.get(key)
+        if reply is not MISSING:
+            return reply
+        if self.shared_cache:
+            reply = await self.shared_cache.get("replies", make_key(*key))
+            if reply is not None:
+                self.cache.set(key, reply)
+                return reply
+        return None
+
+    async def store(
+        self,
+        query: str,
+        city: Optional[str],
+        category: Optional[str],
+        offers: List[Dict],
+        reply: str,
+    ) -> None:
+        """Remember a reply that was generated outside get_or_generate"""
+        key = self._key(query, city, category, offers)
+        self.cache.set(key, reply)
+        if self.shared_cache:
+            await self.shared_cache.set("replies", make_key(*key), reply, self.ttl)
+
+    async def get_or_generate(
+        self,
+        query: str,
+        city: Optional[str],
+        category: Optional[str],
+        offers: List[Dict],
+        generate: Callable[[], Awaitable[str]],
+    ) -> str:
+        key = self._key(query, city, category, offers)
+        reply = self.cache.get(key)
+        if reply is not MISSING:
+            return reply
+
+        if self.shared_cache:
+            reply = await self.shared_cache.get_or_compute(
+                "replies", make_key(*key), generate, self.ttl
+            )
+        else:
+            reply = await generate()
+        self.cache.set(key, reply)
+        return reply
+
+    def _key(self, query, city, category, offers) -> Tuple:
+        return ("reply", intent_key(query, city, category), offers_fingerprint(offers))
+
+    def clear(self) -> None:
+        self.cache.clear()
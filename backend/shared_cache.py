@@ -0,0 +1,368 @@
+"""
+Shared Cache for Know Your Local Offers
+Optional Redis-backed cache tier shared by every uvicorn worker, with stampede protection
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis is optional; without it the shared tier is disabled
+    redis_asyncio = None
+
+
+def make_key(*parts: Any) -> str:
+    """Stable, bounded-length cache key for arbitrary JSON-serialisable parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SharedCache:
+    """Read-through cache on Redis.
+
+    Values are JSON-encoded once and stored together with the scope
+    generation they were computed under, so `bump(scope)` invalidates every
+    entry of a scope across all workers with a single INCR. Reads fetch the
+    generation and the value in one pipelined round trip.
+
+    On a miss, concurrent callers in the same worker share one computation,
+    and across workers a short-lived NX lock lets a single worker compute
+    while the others poll for its result.
+
+    `generation(scope)` is kept per worker for `generation_ttl` seconds, so
+    callers that check it before a local cache lookup do not pay a Redis
+    round trip per read; a bump on another worker is seen within that time.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        namespace: str = "klo",
+        lock_timeout: float = 10.0,
+        wait_timeout: float = 5.0,
+        poll_interval: float = 0.05,
+        generation_ttl: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.generation_ttl = generation_ttl
+        self._clock = clock
+        # scope -> (generation or None if Redis was unreachable, when it was read)
+        self._generations: Dict[str, Tuple[Optional[int], float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedCache"]:
+        """Build a SharedCache from REDIS_URL, or None when it is not configured"""
+        url = os.getenv("REDIS_URL")
+        if not url:
+            return None
+        if redis_asyncio is None:
+            print(
+                "[SharedCache] REDIS_URL is set but the redis package is not installed"
+            )
+            return None
+        client = redis_asyncio.from_url(
+            url,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            socket_timeout=float(os.getenv("REDIS_TIMEOUT", "0.5")),
+            socket_connect_timeout=float(os.getenv("REDIS_TIMEOUT", "0.5")),
+        )
+        return cls(
+            client,
+            namespace=os.getenv("REDIS_NAMESPACE", "klo"),
+            generation_ttl=float(os.getenv("REDIS_GENERATION_TTL", "1")),
+        )
+
+    async def get_or_compute(
+        self,
+        scope: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        """Return the cached value for `key`, computing it at most once per miss"""
+        name = f"{scope}:{key}"
+        task = self._inflight.get(name)
+        if task is None:
+            # The computation runs in its own task, so a caller that is
+            # cancelled (e.g. its client disconnected) only stops waiting;
+            # everyone else sharing the miss still gets the value
+            task = asyncio.ensure_future(self._get_or_compute(scope, key, loader, ttl))
+            self._inflight[name] = task
+            task.add_done_callback(lambda done: self._finish(name, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, name: str, task: asyncio.Task) -> None:
+        if self._inflight.get(name) is task:
+            del self._inflight[name]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody is waiting for is not logged
+            task.exception()
+
+    async def generation(self, scope: str) -> Optional[int]:
+        """Generation of `scope`, at most `generation_ttl` old; None if Redis is unreachable"""
+        now = self._clock()
+        known = self._generations.get(scope)
+        if known is not None and now - known[1] < self.generation_ttl:
+            return known[0]
+        try:
+            generation = int(await self.client.get(self._generation_key(scope)) or 0)
+        except Exception as e:
+            # Remembered too, so an outage costs one timeout per interval, not per read
+            self.errors += 1
+            print(f"[SharedCache] read error: {e}")
+            generation = None
+        self._generations[scope] = (generation, now)
+        return generation
+
+    async def _get_or_compute(
+        self,
+        scope: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+    ) -> Any:
+        try:
+            generation, found, value = await self._read(scope, key)
+        except Exception as e:
+            # Redis is an optimisation: never fail a request because of it
+            self.errors += 1
+            print(f"[SharedCache] read error: {e}")
+            return await loader()
+
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        lock_key = self._lock_key(scope, key, generation)
+        try:
+            acquired = await self.client.set(
+                lock_key, "1", nx=True, px=int(self.lock_timeout * 1000)
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"[SharedCache] lock error: {e}")
+            return await loader()
+
+        if not acquired:
+            # Another worker is computing this value; wait briefly for it
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    _, found, value = await self._read(scope, key)
+                except Exception:
+                    break
+                if found:
+                    return value
+
+        try:
+            value = await loader()
+        except Exception:
+            if acquired:
+                await self._safe(self.client.delete(lock_key))
+            raise
+
+        await self._write(scope, key, generation, value, ttl, lock_key)
+        return value
+
+    async def get(self, scope: str, key: str) -> Any:
+        """Return the cached value for `key`, or None on a miss"""
+        try:
+            _, found, value = await self._read(scope, key)
+        except Exception as e:
+            self.errors += 1
+            print(f"[SharedCache] read error: {e}")
+            return None
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return None
+
+    async def set(self, scope: str, key: str, value: Any, ttl: float) -> None:
+        """Store a value computed outside get_or_compute (e.g. a streamed reply)"""
+        try:
+            generation = int(await self.client.get(self._generation_key(scope)) or 0)
+        except Exception as e:
+            self.errors += 1
+            print(f"[SharedCache] read error: {e}")
+            return
+        payload = json.dumps(
+            {"g": generation, "v": value}, default=str, separators=(",", ":")
+        )
+        await self._safe(
+            self.client.set(self._value_key(scope, key), payload, px=int(ttl * 1000))
+        )
+
+    async def bump(self, scope: str) -> None:
+        """Invalidate every entry in `scope` on all workers"""
+        generation = await self._safe(self.client.incr(self._generation_key(scope)))
+        if generation is None:
+            self._generations.pop(scope, None)
+        else:
+            # This worker sees its own writes at once
+            self._generations[scope] = (int(generation), self._clock())
+
+    async def aclose(self) -> None:
+        close = getattr(self.client, "aclose", None) or getattr(self.client, "close")
+        await self._safe(close())
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+    async def _read(self, scope: str, key: str):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self._generation_key(scope))
+        pipe.get(self._value_key(scope, key))
+        raw_generation, raw_value = await pipe.execute()
+
+        generation = int(raw_generation or 0)
+        self._generations[scope] = (generation, self._clock())
+        if raw_value is None:
+            return generation, False, None
+        envelope = json.loads(raw_value)
+        if envelope["g"] != generation:
+            return generation, False, None
+        return generation, True, envelope["v"]
+
+    async def _write(
+        self,
+        scope: str,
+        key: str,
+        generation: int,
+        value: Any,
+        ttl: float,
+        lock_key: str,
+    ) -> None:
+        payload = json.dumps(
+            {"g": generation, "v": value}, default=str, separators=(",", ":")
+        )
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self._value_key(scope, key), payload, px=int(ttl * 1000))
+        pipe.delete(lock_key)
+        await self._safe(pipe.execute())
+
+    async def _safe(self, awaitable: Awaitable) -> Any:
+        try:
+            return await awaitable
+        except Exception as e:
+            self.errors += 1
+            print(f"[SharedCache] write error: {e}")
+            return None
+
+    def _generation_key(self, scope: str) -> str:
+        return f"{self.namespace}:{scope}:gen"
+
+    def _value_key(self, scope: str, key: str) -> str:
+        return f"{self.namespace}:{scope}:v:{key}"
+
+    def _lock_key(self, scope: str, key: str, generation: int) -> str:
+        return f"{self.namespace}:{scope}:lock:{generation}:{key}"
+
+
+class InMemoryRedis:
+    """Single-process stand-in for the redis.asyncio commands SharedCache uses"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ex: Optional[float] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+    ) -> Optional[bool]:
+        return self._set(key, value, ex, px, nx)
+
+    async def delete(self, *keys: str) -> int:
+        return self._delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return self._incr(key)
+
+    def pipeline(self, transaction: bool = True) -> "_InMemoryPipeline":
+        return _InMemoryPipeline(self)
+
+    async def aclose(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= self._clock():
+            self._delete(key)
+        value = self._data.get(key)
+        if value is None:
+            return None
+        return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+    def _set(self, key, value, ex=None, px=None, nx=False) -> Optional[bool]:
+        if nx and self._get(key) is not None:
+            return None
+        self._data[key] = value
+        self._expires.pop(key, None)
+        if px is not None:
+            self._expires[key] = self._clock() + px / 1000
+        elif ex is not None:
+            self._expires[key] = self._clock() + ex
+        return True
+
+    def _delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            removed += self._data.pop(key, None) is not None
+            self._expires.pop(key, None)
+        return removed
+
+    def _incr(self, key: str) -> int:
+        value = int(self._get(key) or 0) + 1
+        self._data[key] = value
+        return value
+
+
+class _InMemoryPipeline:
+    def __init__(self, store: InMemoryRedis):
+        self._store = store
+        self._commands = []
+
+    def get(self, key: str) -> "_InMemoryPipeline":
+        self._commands.append((self._store._get, (key,), {}))
+        return self
+
+    def set(self, key: str, value: Any, **kwargs) -> "_InMemoryPipeline":
+        self._commands.append((self._store._set, (key, value), kwargs))
+        return self
+
+    def delete(self, *keys: str) -> "_InMemoryPipeline":
+        self._commands.append((self._store._delete, keys, {}))
+        return self
+
+    def incr(self, key: str) -> "_InMemoryPipeline":
+        self._commands.append((self._store._incr, (key,), {}))
+        return self
+
+    async def execute(self) -> list:
+        commands, self._commands = self._commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
@@ -0,0 +1,107 @@
+"""
+Supabase Repository for Know Your Local Offers
+Async PostgREST access to Supabase tables over a pooled keep-alive HTTP/2 client
+"""
+
+import os
+import importlib.util
+from typing import Any, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from metrics import timed
+
+load_dotenv()
+
+
+class RepositoryError(Exception):
+    """Raised when the Supabase REST API returns an error"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SupabaseRepository:
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        url = url or os.getenv("SUPABASE_URL") or ""
+        key = key or os.getenv("SUPABASE_KEY") or ""
+        max_connections = max_connections or int(
+            os.getenv("SUPABASE_MAX_CONNECTIONS", "20")
+        )
+        timeout = timeout or float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+        self.client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Accept": "application/json",
+            },
+            # HTTP/2 multiplexes concurrent lookups over a single connection
+            http2=transport is None and importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            transport=transport,
+        )
+
+    @timed("supabase.select")
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select rows using PostgREST filter syntax, e.g. {"city": "ilike.*Pune*"}"""
+        params = {"select": columns}
+        params.update(filters or {})
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = str(limit)
+
+        response = await self.client.get(f"/{table}", params=params)
+        return self._json(response)
+
+    @timed("supabase.insert")
+    async def insert(self, table: str, row: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Insert a row and return the stored representation"""
+        response = await self.client.post(
+            f"/{table}",
+            json=row,
+            headers={"Prefer": "return=representation"},
+        )
+        return self._json(response)
+
+    @timed("supabase.rpc")
+    async def rpc(self, function: str, args: Dict[str, Any]) -> Any:
+        """Call a Postgres function exposed through PostgREST"""
+        response = await self.client.post(f"/rpc/{function}", json=args)
+        return self._json(response)
+
+    def _json(self, response: httpx.Response) -> Any:
+        if response.status_code >= 400:
+            raise RepositoryError(
+                f"{response.request.method} {response.request.url.path} "
+                f"failed with {response.status_code}: {response.text}",
+                status_code=response.status_code,
+            )
+        return response.json() if response.content else []
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections"""
+        await self.client.aclose()
@@ -0,0 +1,53 @@
+"""
+Test suite for the in-process TTL + LRU cache
+"""
+
+from cache import MISSING, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_hit_and_miss_counters(self):
+        cache = TTLCache(max_size=4)
+        assert cache.get(("get_offers_by_city", "Pune")) is MISSING
+        cache.set(("get_offers_by_city", "Pune"), [1])
+        assert cache.get(("get_offers_by_city", "Pune")) == [1]
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["namespaces"]["get_offers_by_city"] == {"hits": 1, "misses": 1}
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(max_size=4, clock=clock)
+        cache.set("trending", [1], ttl=10)
+        clock.now = 9.9
+        assert cache.get("trending") == [1]
+        clock.now = 10.0
+        assert cache.get("trending") is MISSING
+        assert len(cache) == 0
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_by_predicate(self):
+        cache = TTLCache()
+        cache.set(("city", "Pune"), 1)
+        cache.set(("city", "Sangli"), 2)
+        assert cache.invalidate(lambda key: key[1] == "Pune") == 1
+        assert cache.get(("city", "Sangli")) == 2
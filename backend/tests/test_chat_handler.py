@@ -0,0 +1,58 @@
+"""
+Test suite for ChatHandler streaming
+The LLM, database and gazetteer are replaced by stand-ins
+"""
+
+import asyncio
+
+import pytest
+
+from chat_handler import ChatHandler
+
+OFFERS = [{"store_name": "Shri Jewellers", "offer_text": "15% off on gold bangles"}]
+APOLOGY = "Sorry, there was a technical issue. Please try again with an offers query."
+
+
+class FailingLLM:
+    def __init__(self, deltas):
+        self.deltas = deltas
+
+    async def stream(self, **kwargs):
+        for delta in self.deltas:
+            yield delta
+        raise RuntimeError("connection reset")
+
+
+class StubChat(ChatHandler):
+    def __init__(self, deltas):
+        super().__init__(
+            llm_client=FailingLLM(deltas), db_service=object(), gazetteer=object()
+        )
+
+    def analyze(self, text):
+        return {"offers": True, "city": "Kolhapur", "category": "jewellery"}
+
+    async def _search_offers_intelligently(self, text, city, category):
+        return OFFERS
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestStreamReply:
+    def test_failure_before_the_first_token_sends_the_apology(self):
+        chat = StubChat([])
+        assert asyncio.run(collect(chat.stream_reply("gold offers"))) == [APOLOGY]
+
+    def test_failure_after_a_token_is_raised_not_appended(self):
+        chat = StubChat(["Here are "])
+        seen = []
+
+        async def scenario():
+            async for delta in chat.stream_reply("gold offers"):
+                seen.append(delta)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(scenario())
+        assert seen == ["Here are "]
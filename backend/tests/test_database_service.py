@@ -0,0 +1,320 @@
+"""
+Test suite for DatabaseService
+Runs the service against a local PostgREST stand-in via httpx.MockTransport
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+
+from database_service import DatabaseService
+from shared_cache import InMemoryRedis, SharedCache
+from supabase_repository import SupabaseRepository
+
+OFFERS = [
+    {
+        "store_name": "Shri Jewellers",
+        "city": "Kolhapur",
+        "category": "jewellery",
+        "offer_text": "15% off on gold bangles",
+        "valid_till": "2025-06-30",
+    },
+    {
+        "store_name": "Ranka Jewellers",
+        "city": "Pune",
+        "category": "jewellery",
+        "offer_text": "Free gold coin on 75K+ purchases",
+        "valid_till": "2025-07-15",
+    },
+]
+
+
+def make_service(handler):
+    repository = SupabaseRepository(
+        url="http://supabase.test",
+        key="test-key",
+        transport=httpx.MockTransport(handler),
+    )
+    return DatabaseService(repository=repository)
+
+
+class TestDatabaseService:
+    def test_search_offers_calls_ranked_search_function(self):
+        seen = {}
+
+        def handler(request):
+            seen["path"] = request.url.path
+            seen["body"] = json.loads(request.content)
+            return httpx.Response(200, json=OFFERS[:1])
+
+        service = make_service(handler)
+        offers = asyncio.run(service.search_offers(" Gold ", "Kolhapur", None, limit=5))
+
+        assert offers == OFFERS[:1]
+        assert seen["path"] == "/rest/v1/rpc/search_offers"
+        assert seen["body"] == {
+            "search_query": "gold",
+            "city_filter": "Kolhapur",
+            "category_filter": None,
+            "max_results": 5,
+        }
+
+    def test_search_offers_falls_back_to_ilike_filters(self):
+        seen = {}
+
+        def handler(request):
+            if request.url.path.startswith("/rest/v1/rpc/"):
+                return httpx.Response(404, json={"code": "PGRST202"})
+            seen["path"] = request.url.path
+            seen["params"] = parse_qs(request.url.query.decode())
+            seen["apikey"] = request.headers["apikey"]
+            return httpx.Response(200, json=OFFERS[:1])
+
+        service = make_service(handler)
+        offers = asyncio.run(
+            service.search_offers("gold", "Kolhapur", "jewellery", limit=5)
+        )
+
+        assert offers == OFFERS[:1]
+        assert seen["path"] == "/rest/v1/offers"
+        assert seen["apikey"] == "test-key"
+        assert seen["params"]["city"] == ["ilike.*Kolhapur*"]
+        assert seen["params"]["category"] == ["eq.jewellery"]
+        assert seen["params"]["limit"] == ["5"]
+        assert seen["params"]["order"] == ["valid_till.asc"]
+        assert 'offer_text.ilike."*gold*"' in seen["params"]["or"][0]
+
+    def test_errors_return_empty_list(self):
+        service = make_service(lambda request: httpx.Response(500, text="boom"))
+        assert asyncio.run(service.get_offers_by_city("Pune")) == []
+
+    def test_add_offer_requires_fields(self):
+        service = make_service(lambda request: httpx.Response(201, json=[{}]))
+        assert asyncio.run(service.add_offer({"store_name": "Only name"})) is False
+
+    def test_add_offer_posts_representation(self):
+        def handler(request):
+            assert request.method == "POST"
+            assert request.headers["prefer"] == "return=representation"
+            return httpx.Response(201, json=[json.loads(request.content)])
+
+        service = make_service(handler)
+        assert asyncio.run(service.add_offer(dict(OFFERS[0]))) is True
+
+    def test_get_cities_reads_catalog_aggregate(self):
+        rows = [
+            {"kind": "city", "value": "Pune", "offer_count": 2},
+            {"kind": "city", "value": "Kolhapur", "offer_count": 3},
+            {"kind": "category", "value": "jewellery", "offer_count": 5},
+        ]
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(200, json=rows)
+
+        service = make_service(handler)
+
+        async def scenario():
+            return (
+                await service.get_cities(),
+                await service.get_categories(),
+                await service.get_city_counts(),
+            )
+
+        cities, categories, counts = asyncio.run(scenario())
+        assert cities == ["Kolhapur", "Pune"]
+        assert categories == ["jewellery"]
+        assert counts == {"Kolhapur": 3, "Pune": 2}
+        assert paths == ["/rest/v1/offer_catalog"]
+
+    def test_catalog_falls_back_to_scan_and_tracks_writes(self):
+        rows = [{"city": "Pune", "category": "jewellery"}, {"city": "Pune"}]
+
+        def handler(request):
+            if request.url.path.endswith("offer_catalog"):
+                return httpx.Response(404, json={"message": "relation does not exist"})
+            if request.method == "POST":
+                return httpx.Response(201, json=[json.loads(request.content)])
+            return httpx.Response(200, json=rows)
+
+        service = make_service(handler)
+
+        async def scenario():
+            assert await service.get_cities() == ["Pune"]
+            await service.add_offer(dict(OFFERS[0]))
+            return await service.get_city_counts()
+
+        assert asyncio.run(scenario()) == {"Kolhapur": 1, "Pune": 2}
+
+    def test_business_places_read_the_distinct_view(self):
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(
+                200, json=[{"city": "Satara", "category": "jewellery"}]
+            )
+
+        service = make_service(handler)
+        places = asyncio.run(service.get_business_places())
+        assert places == [{"city": "Satara", "category": "jewellery"}]
+        assert paths == ["/rest/v1/business_places"]
+
+
+class TestDatabaseServiceCache:
+    def test_repeated_lookup_hits_cache(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json=OFFERS[:1])
+
+        service = make_service(handler)
+        for _ in range(3):
+            assert asyncio.run(service.get_offers_by_city("Kolhapur", 5)) == OFFERS[:1]
+        assert len(calls) == 1
+        assert service.cache.stats()["namespaces"]["get_offers_by_city"]["hits"] == 2
+
+    def test_failed_lookup_is_not_cached(self):
+        responses = [httpx.Response(503), httpx.Response(200, json=OFFERS)]
+        service = make_service(lambda request: responses.pop(0))
+        assert asyncio.run(service.get_trending_offers(3)) == []
+        assert asyncio.run(service.get_trending_offers(3)) == OFFERS
+
+    def test_add_offer_invalidates_matching_keys_only(self):
+        def handler(request):
+            if request.method == "POST":
+                return httpx.Response(201, json=[json.loads(request.content)])
+            return httpx.Response(200, json=[])
+
+        service = make_service(handler)
+
+        async def scenario():
+            await service.get_offers_by_city("Kolhapur", 5)
+            await service.get_offers_by_city("Pune", 5)
+            await service.get_trending_offers(3)
+            await service.search_offers("gold", "Pune", "jewellery", 5)
+            await service.add_offer(dict(OFFERS[0]))
+
+        asyncio.run(scenario())
+        keys = set(service.cache._entries)
+        assert ("get_offers_by_city", "Pune", None, 5) in keys
+        assert ("search_offers", "Pune", "jewellery", "gold", 5) in keys
+        assert ("get_offers_by_city", "Kolhapur", None, 5) not in keys
+        assert ("get_trending_offers", None, None, 3) not in keys
+
+    def test_write_on_one_worker_retires_local_entries_on_others(self):
+        store = InMemoryRedis()
+        rows = [OFFERS[0]]
+        now = [0.0]
+
+        def handler(request):
+            if request.method == "POST":
+                rows.append(json.loads(request.content))
+                return httpx.Response(201, json=[rows[-1]])
+            return httpx.Response(200, json=list(rows))
+
+        def worker():
+            service = make_service(handler)
+            service.shared_cache = SharedCache(store, clock=lambda: now[0])
+            return service
+
+        reader, writer = worker(), worker()
+
+        async def scenario():
+            assert await reader.get_trending_offers(5) == [OFFERS[0]]
+            await writer.add_offer(dict(OFFERS[1]))
+            # The reader trusts its copy of the generation for generation_ttl
+            stale = await reader.get_trending_offers(5)
+            now[0] += reader.shared_cache.generation_ttl
+            return stale, await reader.get_trending_offers(5)
+
+        stale, fresh = asyncio.run(scenario())
+        assert stale == [OFFERS[0]]
+        assert fresh == [OFFERS[0], OFFERS[1]]
+
+    def test_local_hits_make_no_redis_calls(self):
+        store = CountingRedis()
+        service = make_service(lambda request: httpx.Response(200, json=OFFERS[:1]))
+        service.shared_cache = SharedCache(store)
+
+        async def scenario():
+            await service.get_trending_offers(5)
+            before = store.calls
+            for _ in range(5):
+                await service.get_trending_offers(5)
+            return store.calls - before
+
+        assert asyncio.run(scenario()) == 0
+
+
+class CountingRedis(InMemoryRedis):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        return await super().get(key)
+
+    def pipeline(self, transaction=True):
+        self.calls += 1
+        return super().pipeline(transaction=transaction)
+
+
+class TestRankedOffers:
+    def test_single_rpc_returns_tagged_offers(self):
+        rows = [{"offer": OFFERS[0], "match_tier": "city", "match_score": 3.5}]
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(200, json=rows)
+
+        service = make_service(handler)
+        offers = asyncio.run(service.get_ranked_offers("", "Kolhapur", None))
+
+        assert paths == ["/rest/v1/rpc/ranked_offers"]
+        assert offers == [{**OFFERS[0], "match_tier": "city", "match_score": 3.5}]
+
+    def test_fallback_walks_tiers_in_order(self):
+        def handler(request):
+            if request.url.path.startswith("/rest/v1/rpc/"):
+                return httpx.Response(404, json={"code": "PGRST202"})
+            params = parse_qs(request.url.query.decode())
+            if "city" in params:
+                return httpx.Response(200, json=[])
+            return httpx.Response(200, json=OFFERS)
+
+        service = make_service(handler)
+        offers = asyncio.run(service.get_ranked_offers("gold", "Sangli", "jewellery"))
+
+        assert [offer["match_tier"] for offer in offers] == ["category", "category"]
+        assert offers[0]["match_score"] > offers[1]["match_score"] > 2
+
+    def test_failed_fallback_tier_is_not_cached(self):
+        outage = [True]
+
+        def handler(request):
+            if request.url.path.startswith("/rest/v1/rpc/"):
+                return httpx.Response(404, json={"code": "PGRST202"})
+            params = parse_qs(request.url.query.decode())
+            if "or" in params:
+                return httpx.Response(200, json=[])  # nothing matches the query
+            if outage[0]:
+                return httpx.Response(503, json={"message": "unavailable"})
+            return httpx.Response(200, json=OFFERS[:1])
+
+        service = make_service(handler)
+
+        async def scenario():
+            during = await service.get_ranked_offers("diamond", "Kolhapur", None)
+            outage[0] = False
+            return during, await service.get_ranked_offers("diamond", "Kolhapur", None)
+
+        during, after = asyncio.run(scenario())
+        assert during == []
+        assert [offer["match_tier"] for offer in after] == ["city"]
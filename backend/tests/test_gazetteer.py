@@ -0,0 +1,101 @@
+"""
+Test suite for the Gazetteer
+Uses an in-memory stand-in for DatabaseService, so no Supabase calls are made
+"""
+
+import asyncio
+
+from gazetteer import Gazetteer, build_snapshot
+
+
+class FakeDatabase:
+    def __init__(self, cities=(), categories=(), businesses=(), aliases=()):
+        self.cities = list(cities)
+        self.categories = list(categories)
+        self.businesses = list(businesses)
+        self.aliases = list(aliases)
+
+    async def get_cities(self):
+        return self.cities
+
+    async def get_categories(self):
+        return self.categories
+
+    async def get_business_places(self):
+        return self.businesses
+
+    async def get_place_aliases(self):
+        return self.aliases
+
+
+class TestBuildSnapshot:
+    def test_cities_localities_and_aliases_resolve_to_the_city(self):
+        snapshot = build_snapshot(
+            ["Nashik"],
+            ["jewellery"],
+            businesses=[{"city": "Satara", "category": "jewellery"}],
+            aliases=[
+                {"alias": "Rajarampuri", "kind": "city", "value": "Kolhapur"},
+                {"alias": "mangalsutra", "kind": "category", "value": "jewellery"},
+            ],
+        )
+        analyze = snapshot["matcher"].analyze
+        assert analyze("gold offers in nashik")["city"] == "Nashik"
+        assert analyze("shops in Satara")["city"] == "Satara"
+        assert analyze("mangalsutra near rajarampuri") == {
+            "offers": True,
+            "city": "Kolhapur",
+            "category": "jewellery",
+            "greeting": False,
+        }
+
+    def test_data_categories_win_over_the_seed_vocabulary(self):
+        snapshot = build_snapshot([], ["gold", "jewellery"])
+        assert snapshot["matcher"].analyze("gold coins")["category"] == "gold"
+        assert snapshot["matcher"].analyze("bangles")["category"] == "jewellery"
+
+    def test_only_places_with_offers_are_advertised(self):
+        snapshot = build_snapshot(
+            ["Sangli", "Pune"], ["jewellery"], businesses=[{"city": "Satara"}]
+        )
+        assert snapshot["cities"] == ["Pune", "Sangli"]
+
+
+class TestGazetteer:
+    def test_seed_vocabulary_before_first_load(self):
+        gazetteer = Gazetteer(FakeDatabase())
+        assert gazetteer.analyze("offers in Kolhapur")["city"] == "Kolhapur"
+        assert "Kolhapur" in gazetteer.cities()
+
+    def test_refresh_swaps_in_new_cities(self):
+        db = FakeDatabase(cities=["Kolhapur"], categories=["jewellery"])
+        gazetteer = Gazetteer(db)
+        asyncio.run(gazetteer.refresh())
+        assert gazetteer.analyze("offers in Nagpur")["city"] is None
+
+        db.cities.append("Nagpur")
+        asyncio.run(gazetteer.refresh())
+        assert gazetteer.analyze("offers in Nagpur")["city"] == "Nagpur"
+        assert gazetteer.cities() == ["Kolhapur", "Nagpur"]
+
+    def test_empty_load_keeps_the_current_vocabulary(self):
+        db = FakeDatabase(cities=["Nagpur"])
+        gazetteer = Gazetteer(db)
+        asyncio.run(gazetteer.refresh())
+        db.cities = []
+        asyncio.run(gazetteer.refresh())
+        assert gazetteer.analyze("offers in Nagpur")["city"] == "Nagpur"
+
+    def test_background_loop_loads_and_stops(self):
+        gazetteer = Gazetteer(FakeDatabase(cities=["Nagpur"]), refresh_seconds=60)
+
+        async def scenario():
+            gazetteer.start()
+            for _ in range(100):
+                if gazetteer.loaded_at:
+                    break
+                await asyncio.sleep(0.01)
+            await gazetteer.stop()
+
+        asyncio.run(scenario())
+        assert gazetteer.cities() == ["Nagpur"]
@@ -0,0 +1,74 @@
+"""
+Test suite for IntentMatcher
+Checks intent, city and category extraction from WhatsApp and chat messages
+"""
+
+from intent_matcher import IntentMatcher
+
+
+class TestIntentMatcher:
+    def setup_method(self):
+        self.matcher = IntentMatcher()
+
+    def test_intent_city_and_category_in_one_pass(self):
+        assert self.matcher.analyze("Gold offers in Kolhapur") == {
+            "offers": True,
+            "city": "Kolhapur",
+            "category": "jewellery",
+            "greeting": False,
+        }
+
+    def test_plurals_and_case_are_matched(self):
+        result = self.matcher.analyze("Any EARRINGS deals in PUNE?")
+        assert (result["offers"], result["city"], result["category"]) == (
+            True,
+            "Pune",
+            "jewellery",
+        )
+        assert self.matcher.analyze("best cities for bangles")["offers"]
+
+    def test_terms_inside_other_words_do_not_match(self):
+        # "get" in "together", "any" in "company", "sale" in "wholesale"
+        assert not self.matcher.analyze("company together")["offers"]
+        assert self.matcher.analyze("wholesaler")["offers"] is False
+
+    def test_city_alone_is_an_offers_query(self):
+        assert self.matcher.analyze("Sangli") == {
+            "offers": True,
+            "city": "Sangli",
+            "category": None,
+            "greeting": False,
+        }
+
+    def test_first_mentioned_city_wins(self):
+        assert self.matcher.analyze("Pune or Mumbai")["city"] == "Pune"
+
+    def test_custom_vocabulary(self):
+        matcher = IntentMatcher(
+            offer_keywords=["deal"],
+            cities={"bombay": "Mumbai", "navi mumbai": "Navi Mumbai"},
+            categories={"electronics": ["phone", "laptop"]},
+        )
+        assert matcher.analyze("laptop deals in Navi Mumbai") == {
+            "offers": True,
+            "city": "Navi Mumbai",
+            "category": "electronics",
+            "greeting": False,
+        }
+        assert matcher.analyze("phones in bombay")["city"] == "Mumbai"
+
+    def test_empty_vocabulary_matches_nothing(self):
+        matcher = IntentMatcher(
+            offer_keywords=[], cities={}, categories={}, greetings=[]
+        )
+        assert matcher.analyze("hi, gold offers") == {
+            "offers": False,
+            "city": None,
+            "category": None,
+            "greeting": False,
+        }
+
+    def test_greetings_match_whole_words_only(self):
+        assert self.matcher.analyze("Hi there!")["greeting"]
+        # "hi" inside "which" or "this" used to trigger the welcome message
+        assert not self.matcher.analyze("which shop has this ring")["greeting"]
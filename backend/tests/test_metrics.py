@@ -0,0 +1,129 @@
+"""
+Test suite for Prometheus metrics
+Stage timers, the HTTP middleware and cache counters, read back from the registry
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+pytest.importorskip("prometheus_client")
+from prometheus_client import CollectorRegistry, REGISTRY, generate_latest
+
+from cache import TTLCache
+from metrics import CacheCollector, MetricsMiddleware, timed
+
+
+def stage_count(stage):
+    return REGISTRY.get_sample_value("klo_stage_seconds_count", {"stage": stage}) or 0
+
+
+class TestTimed:
+    def test_coroutines_and_plain_functions(self):
+        @timed("test.coroutine")
+        async def coroutine():
+            return 1
+
+        @timed("test.function")
+        def function():
+            return 2
+
+        before = stage_count("test.coroutine"), stage_count("test.function")
+        assert asyncio.run(coroutine()) == 1
+        assert function() == 2
+        assert stage_count("test.coroutine") == before[0] + 1
+        assert stage_count("test.function") == before[1] + 1
+
+    def test_async_generators_are_timed_until_exhausted(self):
+        @timed("test.stream")
+        async def stream():
+            for i in range(3):
+                yield i
+
+        async def consume():
+            seen = []
+            async for item in stream():
+                assert (
+                    REGISTRY.get_sample_value(
+                        "klo_stage_in_flight", {"stage": "test.stream"}
+                    )
+                    == 1
+                )
+                seen.append(item)
+            return seen
+
+        before = stage_count("test.stream")
+        assert asyncio.run(consume()) == [0, 1, 2]
+        assert stage_count("test.stream") == before + 1
+        assert (
+            REGISTRY.get_sample_value("klo_stage_in_flight", {"stage": "test.stream"})
+            == 0
+        )
+
+    def test_failures_are_still_recorded(self):
+        @timed("test.failure")
+        async def failure():
+            raise ValueError("boom")
+
+        before = stage_count("test.failure")
+        with pytest.raises(ValueError):
+            asyncio.run(failure())
+        assert stage_count("test.failure") == before + 1
+
+
+class TestMetricsMiddleware:
+    def request_count(self, route, status):
+        labels = {"method": "GET", "route": route, "status": status}
+        return REGISTRY.get_sample_value("klo_http_request_seconds_count", labels) or 0
+
+    def test_known_routes_and_unknown_paths(self):
+        app = FastAPI()
+
+        @app.get("/metrics-test")
+        def handler():
+            return {"ok": True}
+
+        app.add_middleware(
+            MetricsMiddleware, routes={route.path for route in app.routes}
+        )
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                await client.get("/metrics-test")
+                await client.get("/wp-login.php")
+
+        before = self.request_count("/metrics-test", "200")
+        before_other = self.request_count("other", "404")
+        asyncio.run(scenario())
+        assert self.request_count("/metrics-test", "200") == before + 1
+        assert self.request_count("other", "404") == before_other + 1
+
+
+class TestCacheCollector:
+    def test_cache_hits_misses_and_gauges(self):
+        cache = TTLCache(max_size=10)
+        cache.set(("offers", "pune"), [1])
+        cache.get(("offers", "pune"))
+        cache.get(("offers", "nagpur"))
+
+        collector = CacheCollector()
+        collector.add_cache("offers", cache)
+        collector.add_gauges("jobs", "Jobs by state", lambda: {"queued": 3})
+        registry = CollectorRegistry()
+        registry.register(collector)
+
+        def value(name, labels):
+            return registry.get_sample_value(name, labels)
+
+        hits = {"cache": "offers", "namespace": "offers", "result": "hits"}
+        misses = dict(hits, result="misses")
+        assert value("klo_cache_requests_total", hits) == 1
+        assert value("klo_cache_requests_total", misses) == 1
+        assert value("klo_cache_entries", {"cache": "offers"}) == 1
+        assert value("klo_jobs", {"item": "queued"}) == 3
+        assert b"klo_cache_requests_total" in generate_latest(registry)
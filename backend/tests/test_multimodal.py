@@ -0,0 +1,109 @@
+"""
+Test suite for the /multimodal endpoint
+The voice, OCR and chat handlers are replaced by stand-ins, so no external calls are made
+"""
+
+import asyncio
+import os
+
+import httpx
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+import app as api  # noqa: E402
+
+
+class FakeVoice:
+    def __init__(self, result=("gold offers in Pune", True), delay=0.0, wait_for=None):
+        self.result = result
+        self.delay = delay
+        self.wait_for = wait_for
+
+    async def transcribe_result(self, audio):
+        if self.wait_for is not None:
+            # Only finishes if the document stage is running at the same time
+            await asyncio.wait_for(self.wait_for.started.wait(), timeout=1)
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+class FakeOCR:
+    def __init__(self, result=("15% off on gold bangles", True)):
+        self.result = result
+        self.started = asyncio.Event()
+
+    async def extract_text_result(self, data):
+        self.started.set()
+        return self.result
+
+
+class FakeChat:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_reply(self, text, language="en"):
+        self.prompts.append(text)
+        return "reply"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    chat = FakeChat()
+    monkeypatch.setattr(api, "chat_handler", chat)
+    return chat
+
+
+def post(monkeypatch, voice, ocr, text=None):
+    monkeypatch.setattr(api, "voice_handler", voice)
+    monkeypatch.setattr(api, "ocr_handler", ocr)
+    data = {"language": "en"}
+    if text:
+        data["text"] = text
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/multimodal",
+                data=data,
+                files={
+                    "audio": ("voice.wav", b"RIFF", "audio/wav"),
+                    "document": ("flyer.png", b"image", "image/png"),
+                },
+            )
+
+    return asyncio.run(scenario())
+
+
+class TestMultimodal:
+    def test_audio_and_document_run_concurrently(self, chat, monkeypatch):
+        ocr = FakeOCR()
+        response = post(monkeypatch, FakeVoice(wait_for=ocr), ocr)
+        assert response.status_code == 200
+        assert response.json()["failed_inputs"] == []
+        assert "User speech: gold offers in Pune" in chat.prompts[0]
+        assert "Document content: 15% off on gold bangles" in chat.prompts[0]
+
+    def test_slow_stage_is_dropped(self, chat, monkeypatch):
+        monkeypatch.setattr(api, "MULTIMODAL_AUDIO_TIMEOUT", 0.05)
+        response = post(monkeypatch, FakeVoice(delay=1), FakeOCR(), text="any deals?")
+        assert response.status_code == 200
+        assert response.json()["failed_inputs"] == ["audio"]
+        assert "User speech" not in chat.prompts[0]
+        assert "Document content" in chat.prompts[0]
+
+    def test_failed_stage_is_reported_not_prompted(self, chat, monkeypatch):
+        voice = FakeVoice(result=("Could not transcribe audio.", False))
+        response = post(monkeypatch, voice, FakeOCR())
+        assert response.status_code == 200
+        assert response.json()["failed_inputs"] == ["audio"]
+        assert "Could not transcribe audio." not in chat.prompts[0]
+
+    def test_every_input_failing_is_a_bad_gateway(self, chat, monkeypatch):
+        voice = FakeVoice(result=("Could not transcribe audio.", False))
+        ocr = FakeOCR(result=("Timed out while processing image.", False))
+        response = post(monkeypatch, voice, ocr)
+        assert response.status_code == 502
+        assert chat.prompts == []
@@ -0,0 +1,263 @@
+"""
+Test suite for OCRHandler caching and batching
+Runs without EasyOCR: the worker pool is replaced by a counting stand-in
+"""
+
+import asyncio
+import io
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import pytest
+
+import ocr_handler
+from cache import DiskCache
+from ocr_handler import OCRHandler, expand_images
+
+
+class CountingOCR(OCRHandler):
+    def __init__(self, cache_dir):
+        super().__init__(max_workers=1, cache_dir=str(cache_dir))
+        self.runs = 0
+
+    async def _run_in_pool(self, image_bytes):
+        self.runs += 1
+        if image_bytes == b"broken":
+            return "Error processing image: broken", False
+        return f"text for {len(image_bytes)} bytes", True
+
+
+class TestOCRCache:
+    def test_duplicate_upload_skips_ocr(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+
+        async def scenario():
+            first = await handler.extract_text(b"flyer-image")
+            second = await handler.extract_text(b"flyer-image")
+            return first, second
+
+        assert asyncio.run(scenario()) == ("text for 11 bytes",) * 2
+        assert handler.runs == 1
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        asyncio.run(CountingOCR(tmp_path).extract_text(b"flyer-image"))
+
+        restarted = CountingOCR(tmp_path)
+        assert (
+            asyncio.run(restarted.extract_text(b"flyer-image")) == "text for 11 bytes"
+        )
+        assert restarted.runs == 0
+
+    def test_settings_are_part_of_the_key(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+        before = handler.cache_key(b"flyer-image")
+        handler.settings = dict(handler.settings, max_side=800)
+        assert handler.cache_key(b"flyer-image") != before
+
+    def test_errors_are_not_cached(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+        asyncio.run(handler.extract_text(b"broken"))
+        asyncio.run(handler.extract_text(b"broken"))
+        assert handler.runs == 2
+
+    def test_disk_write_failure_still_returns_the_text(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+
+        def full_disk(key, data):
+            raise OSError(28, "No space left on device")
+
+        handler.disk_cache.set = full_disk
+        assert asyncio.run(handler.extract_text(b"flyer-image")) == "text for 11 bytes"
+
+
+class TestDiskCache:
+    def test_least_recently_used_files_are_evicted(self, tmp_path):
+        cache = DiskCache(str(tmp_path), max_bytes=10)
+        cache.set("aa01", b"12345")
+        cache.set("bb02", b"12345")
+        cache.get("aa01")
+        cache.set("cc03", b"12345")
+        assert cache.get("bb02") is None
+        assert cache.get("aa01") == b"12345"
+        assert cache.stats()["bytes"] == 10
+
+    def test_file_evicted_before_the_touch_is_a_miss(self, tmp_path, monkeypatch):
+        cache = DiskCache(str(tmp_path), max_bytes=1024)
+        cache.set("aa01", b"12345")
+
+        def evicted(path, *args, **kwargs):
+            raise FileNotFoundError(path)
+
+        monkeypatch.setattr("cache.os.utime", evicted)
+        assert cache.get("aa01") is None
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["bytes"] == 0
+
+    def test_processes_sharing_a_directory_stay_within_budget(self, tmp_path):
+        first = DiskCache(str(tmp_path), max_bytes=10)
+        second = DiskCache(str(tmp_path), max_bytes=10)
+        for i, cache in enumerate([first, second] * 3):
+            cache.set(f"{i:02d}ff", b"12345")
+        on_disk = sum(path.stat().st_size for path in tmp_path.rglob("*ff"))
+        assert on_disk <= 10
+        # The newest file, written by the other cache, survives
+        assert first.get("05ff") == b"12345"
+
+
+class TestBatchOCR:
+    def test_results_cover_every_image(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+        images = [("a.jpg", b"a"), ("b.jpg", b"bb"), ("c.jpg", b"ccc")]
+
+        async def scenario():
+            return [result async for result in handler.extract_batch(images)]
+
+        results = sorted(asyncio.run(scenario()), key=lambda r: r["index"])
+        assert [r["name"] for r in results] == ["a.jpg", "b.jpg", "c.jpg"]
+        assert results[2]["text"] == "text for 3 bytes"
+        assert all(r["elapsed_ms"] >= 0 for r in results)
+
+    def test_zip_archives_are_expanded(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as archive:
+            archive.writestr("week1/front.jpg", b"front")
+            archive.writestr("week1/notes.txt", b"skip me")
+            archive.writestr("week1/back.png", b"back")
+
+        images = expand_images("pack.zip", buf.getvalue(), 10, 1024)
+        assert images == [
+            ("pack.zip/week1/front.jpg", b"front"),
+            ("pack.zip/week1/back.png", b"back"),
+        ]
+        assert expand_images("flyer.jpg", b"raw", 10, 1024) == [("flyer.jpg", b"raw")]
+
+    def test_zip_bombs_are_rejected_from_the_headers(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+            for i in range(5):
+                archive.writestr(f"{i}.jpg", b"\0" * 1000)
+        assert len(buf.getvalue()) < 1000  # compresses to almost nothing
+
+        buf.seek(0)
+        with pytest.raises(ValueError, match="uncompressed"):
+            expand_images("bomb.zip", buf, 10, 1024, max_total_bytes=3000)
+        assert len(expand_images("ok.zip", buf, 10, 1024, max_total_bytes=5000)) == 5
+
+
+class TestBufferInput:
+    def test_memoryview_shares_the_bytes_cache_entry(self, tmp_path):
+        handler = CountingOCR(tmp_path)
+
+        async def scenario():
+            first = await handler.extract_text(memoryview(b"flyer-image"))
+            second = await handler.extract_text(b"flyer-image")
+            return first, second
+
+        assert asyncio.run(scenario()) == ("text for 11 bytes",) * 2
+        assert handler.runs == 1
+
+
+class ScriptedPool:
+    """Executor stand-in whose jobs finish only when the test says so"""
+
+    def __init__(self):
+        self.jobs = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        job = Future()
+        job.set_running_or_notify_cancel()
+        self.jobs.append(job)
+        return job
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class PooledOCR(OCRHandler):
+    def __init__(self, cache_dir, **kwargs):
+        super().__init__(max_workers=1, cache_dir=str(cache_dir), **kwargs)
+        self.pools = []
+
+    def _new_pool(self):
+        self.pools.append(ScriptedPool())
+        return self.pools[-1]
+
+
+class TestWorkerPool:
+    def test_broken_pool_is_replaced(self, tmp_path):
+        handler = PooledOCR(tmp_path, timeout=5)
+
+        async def scenario():
+            first = asyncio.ensure_future(handler._run_in_pool(b"img"))
+            await asyncio.sleep(0.01)
+            handler.pools[0].jobs[0].set_exception(BrokenProcessPool("worker died"))
+            crashed = await first
+
+            second = asyncio.ensure_future(handler._run_in_pool(b"img"))
+            await asyncio.sleep(0.01)
+            handler.pools[1].jobs[0].set_result("GOLD SALE")
+            return crashed, await second
+
+        crashed, recovered = asyncio.run(scenario())
+        assert crashed[1] is False
+        assert recovered == ("GOLD SALE", True)
+        assert handler.pools[0].shut_down and len(handler.pools) == 2
+
+    def test_timed_out_job_keeps_its_slot_until_it_finishes(self, tmp_path):
+        handler = PooledOCR(tmp_path, max_pending=1, timeout=0.05, queue_timeout=0.05)
+
+        async def scenario():
+            timed_out = await handler._run_in_pool(b"slow")
+            busy = await handler._run_in_pool(b"next")
+            handler.pools[0].jobs[0].set_result("late")
+            await asyncio.sleep(0.01)
+            retry = asyncio.ensure_future(handler._run_in_pool(b"next"))
+            await asyncio.sleep(0.01)
+            handler.pools[0].jobs[1].set_result("ok")
+            return timed_out, busy, await retry
+
+        timed_out, busy, retry = asyncio.run(scenario())
+        assert timed_out == ("Timed out while processing image.", False)
+        assert busy == ("OCR service is busy. Please try again shortly.", False)
+        assert retry == ("ok", True)
+
+    def test_mapped_buffers_reach_the_worker_through_shared_memory(
+        self, tmp_path, monkeypatch
+    ):
+        handler = PooledOCR(tmp_path, timeout=5)
+        pool = InlinePool()
+        handler._new_pool = lambda: pool
+        monkeypatch.setattr(
+            ocr_handler, "_run_ocr", lambda image, settings: bytes(image).upper()
+        )
+
+        async def scenario():
+            mapped = await handler._run_in_pool(memoryview(b"gold sale"))
+            plain = await handler._run_in_pool(b"flyer")
+            return mapped, plain
+
+        mapped, plain = asyncio.run(scenario())
+        assert mapped == (b"GOLD SALE", True)
+        assert plain == (b"FLYER", True)
+        (fn, name, size, _), (plain_fn, *_) = pool.calls
+        assert fn is ocr_handler._run_ocr_shared and size == 9
+        assert plain_fn is ocr_handler._run_ocr
+        # The block is unlinked once the job is done
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+class InlinePool:
+    """Executor stand-in that runs each job in the calling thread"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, *args))
+        job = Future()
+        job.set_result(fn(*args))
+        return job
@@ -0,0 +1,82 @@
+"""
+Test suite for the semantic response cache
+"""
+
+import asyncio
+
+from response_cache import ResponseCache, intent_key, offers_fingerprint
+
+OFFERS = [
+    {
+        "store_name": "Shri Jewellers",
+        "city": "Kolhapur",
+        "category": "jewellery",
+        "offer_text": "15% off on gold bangles",
+    }
+]
+
+
+class Generator:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return f"reply {self.calls}"
+
+
+class TestIntentKey:
+    def test_rephrasings_share_an_intent(self):
+        first = intent_key("gold offers in Kolhapur", "Kolhapur", "jewellery")
+        second = intent_key("Kolhapur gold deals", "Kolhapur", "jewellery")
+        assert first == second == ("kolhapur", "jewellery", ("gold",))
+
+    def test_different_terms_do_not_collide(self):
+        gold = intent_key("gold offers in Kolhapur", "Kolhapur", "jewellery")
+        diamond = intent_key("diamond offers in Kolhapur", "Kolhapur", "jewellery")
+        assert gold != diamond
+
+    def test_qualifiers_are_part_of_the_intent(self):
+        keys = {
+            intent_key(query, "Kolhapur", "jewellery")
+            for query in (
+                "gold offers in Kolhapur",
+                "cheapest gold offers",
+                "latest gold offers",
+                "best gold price",
+                "cheap gold sale",
+            )
+        }
+        assert len(keys) == 5
+
+
+class TestResponseCache:
+    def test_equivalent_question_is_served_from_cache(self):
+        cache = ResponseCache(max_size=8, ttl=60)
+        generate = Generator()
+
+        async def scenario():
+            first = await cache.get_or_generate(
+                "gold offers in Kolhapur", "Kolhapur", "jewellery", OFFERS, generate
+            )
+            second = await cache.get_or_generate(
+                "Kolhapur gold deals", "Kolhapur", "jewellery", OFFERS, generate
+            )
+            return first, second
+
+        assert asyncio.run(scenario()) == ("reply 1", "reply 1")
+        assert generate.calls == 1
+
+    def test_changed_offers_miss_the_cache(self):
+        cache = ResponseCache(max_size=8, ttl=60)
+        generate = Generator()
+        updated = [dict(OFFERS[0], offer_text="20% off on gold bangles")]
+
+        async def scenario():
+            await cache.get_or_generate("gold", "Kolhapur", None, OFFERS, generate)
+            return await cache.get_or_generate(
+                "gold", "Kolhapur", None, updated, generate
+            )
+
+        assert asyncio.run(scenario()) == "reply 2"
+        assert offers_fingerprint(OFFERS) != offers_fingerprint(updated)
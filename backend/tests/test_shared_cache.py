@@ -0,0 +1,124 @@
+"""
+Test suite for the shared Redis cache tier
+Uses the InMemoryRedis stand-in; point REDIS_URL at a local Redis for the real thing
+"""
+
+import asyncio
+
+from shared_cache import InMemoryRedis, SharedCache, make_key
+
+
+class Loader:
+    def __init__(self, value, delay=0.0):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+class TestSharedCache:
+    def test_value_is_computed_once_and_reused(self):
+        cache = SharedCache(InMemoryRedis())
+        loader = Loader([{"store_name": "Shri Jewellers"}])
+
+        async def scenario():
+            first = await cache.get_or_compute("offers", "k", loader, ttl=60)
+            second = await cache.get_or_compute("offers", "k", loader, ttl=60)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        assert first == second == [{"store_name": "Shri Jewellers"}]
+        assert loader.calls == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_concurrent_misses_share_one_computation(self):
+        store = InMemoryRedis()
+        workers = [SharedCache(store, poll_interval=0.01) for _ in range(3)]
+        loader = Loader("answer", delay=0.05)
+
+        async def scenario():
+            calls = [
+                worker.get_or_compute("replies", "k", loader, ttl=60)
+                for worker in workers
+                for _ in range(5)
+            ]
+            return await asyncio.gather(*calls)
+
+        assert asyncio.run(scenario()) == ["answer"] * 15
+        assert loader.calls == 1
+
+    def test_bump_invalidates_scope_for_every_worker(self):
+        store = InMemoryRedis()
+        worker_a, worker_b = SharedCache(store), SharedCache(store)
+        loader = Loader("v1")
+
+        async def scenario():
+            await worker_a.get_or_compute("offers", "k", loader, ttl=60)
+            await worker_b.bump("offers")
+            loader.value = "v2"
+            return await worker_a.get_or_compute("offers", "k", loader, ttl=60)
+
+        assert asyncio.run(scenario()) == "v2"
+        assert loader.calls == 2
+
+    def test_failures_are_not_cached(self):
+        cache = SharedCache(InMemoryRedis())
+
+        async def failing():
+            raise RuntimeError("supabase down")
+
+        async def scenario():
+            try:
+                await cache.get_or_compute("offers", "k", failing, ttl=60)
+            except RuntimeError:
+                pass
+            return await cache.get_or_compute("offers", "k", Loader("ok"), ttl=60)
+
+        assert asyncio.run(scenario()) == "ok"
+
+    def test_cancelled_caller_does_not_fail_the_others(self):
+        cache = SharedCache(InMemoryRedis())
+        loader = Loader("answer", delay=0.05)
+
+        async def scenario():
+            owner = asyncio.ensure_future(
+                cache.get_or_compute("offers", "k", loader, ttl=60)
+            )
+            await asyncio.sleep(0)
+            waiters = [
+                cache.get_or_compute("offers", "k", loader, ttl=60) for _ in range(3)
+            ]
+            owner.cancel()
+            return await asyncio.gather(*waiters)
+
+        assert asyncio.run(scenario()) == ["answer"] * 3
+        assert loader.calls == 1
+
+    def test_unreachable_redis_is_asked_once_per_interval(self):
+        now = [0.0]
+        client = UnreachableRedis()
+        cache = SharedCache(client, generation_ttl=1.0, clock=lambda: now[0])
+
+        async def scenario():
+            first = [await cache.generation("offers") for _ in range(3)]
+            now[0] += 1.0
+            return first, await cache.generation("offers")
+
+        assert asyncio.run(scenario()) == ([None] * 3, None)
+        assert client.calls == 2
+
+    def test_make_key_is_order_independent_for_dicts(self):
+        assert make_key({"a": 1, "b": 2}) == make_key({"b": 2, "a": 1})
+
+
+class UnreachableRedis:
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        raise ConnectionError("redis is down")
@@ -0,0 +1,125 @@
+"""
+Test suite for upload size limits and spooled upload buffers
+Drives a small FastAPI app in-process through httpx's ASGI transport
+"""
+
+import asyncio
+import io
+import mmap
+from tempfile import SpooledTemporaryFile
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+
+from uploads import SPOOL_MAX_BYTES, UploadLimitMiddleware, upload_buffer
+
+LIMIT = 1024
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": LIMIT})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        with upload_buffer(file) as data:
+            return {"size": len(data)}
+
+    @app.post("/unlimited")
+    async def unlimited(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return app
+
+
+def post(path, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(path, **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def chunked_multipart(payload: bytes):
+    """Multipart body sent without a Content-Length header"""
+    boundary = "klo-boundary"
+    body = (
+        (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+            f'filename="a.bin"\r\n\r\n'
+        ).encode()
+        + payload
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+
+    async def chunks():
+        for start in range(0, len(body), 256):
+            yield body[start : start + 256]
+
+    return {
+        "content": chunks(),
+        "headers": {"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    }
+
+
+class TestUploadLimit:
+    def test_small_upload_passes(self):
+        response = post("/upload", files={"file": ("a.bin", b"x" * 100)})
+        assert response.status_code == 200
+        assert response.json() == {"size": 100}
+
+    def test_declared_oversize_is_rejected(self):
+        response = post("/upload", files={"file": ("a.bin", b"x" * (LIMIT * 2))})
+        assert response.status_code == 413
+        assert "limit" in response.json()["detail"]
+
+    def test_chunked_oversize_is_cut_off(self):
+        response = post("/upload", **chunked_multipart(b"x" * (LIMIT * 4)))
+        assert response.status_code == 413
+
+    def test_other_paths_are_unlimited(self):
+        response = post("/unlimited", files={"file": ("a.bin", b"x" * (LIMIT * 2))})
+        assert response.json() == {"size": LIMIT * 2}
+
+
+class TestUploadBuffer:
+    def make_upload(self, data: bytes, max_size: int) -> UploadFile:
+        spooled = SpooledTemporaryFile(max_size=max_size)
+        spooled.write(data)
+        spooled.seek(0)
+        return UploadFile(spooled, filename="a.bin")
+
+    def test_small_upload_is_read_once(self):
+        upload = self.make_upload(b"flyer", max_size=1024)
+        with upload_buffer(upload) as data:
+            assert data == b"flyer"
+        upload.file.close()
+
+    def test_bytesio_is_viewed_in_place(self):
+        upload = UploadFile(io.BytesIO(b"flyer"), filename="a.bin")
+        with upload_buffer(upload) as data:
+            assert isinstance(data, memoryview) and bytes(data) == b"flyer"
+        # The view is released, so the buffer can still be closed
+        upload.file.close()
+
+    def test_rolled_over_upload_is_memory_mapped(self):
+        upload = self.make_upload(b"x" * (SPOOL_MAX_BYTES + 1), max_size=1024)
+        with upload_buffer(upload) as data:
+            assert isinstance(data, mmap.mmap) and len(data) == SPOOL_MAX_BYTES + 1
+        assert data.closed
+
+    def test_large_in_memory_upload_is_rolled_over_then_mapped(self):
+        size = SPOOL_MAX_BYTES + 1
+        upload = self.make_upload(b"x" * size, max_size=size * 2)
+        with upload_buffer(upload) as data:
+            assert isinstance(data, mmap.mmap) and data[-1:] == b"x"
+        # The caller's read position is left where it was
+        assert upload.file.read(3) == b"xxx"
+
+    def test_empty_upload(self):
+        upload = self.make_upload(b"", max_size=0)
+        with upload_buffer(upload) as data:
+            assert len(data) == 0
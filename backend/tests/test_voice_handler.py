@@ -0,0 +1,162 @@
+"""
+Test suite for VoiceHandler synthesis caching
+Engines are replaced by counting stand-ins, so no external TTS calls are made
+"""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from voice_handler import VoiceHandler, split_sentences
+
+
+@pytest.fixture(autouse=True)
+def openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+
+class CountingVoice(VoiceHandler):
+    def __init__(self, cache_dir, eleven_key=None):
+        super().__init__(cache_dir=str(cache_dir))
+        self.eleven_key = eleven_key
+        self.calls = []
+
+    async def _eleven_tts(self, text):
+        self.calls.append(("elevenlabs", text))
+        return b"eleven:" + text.encode()
+
+    async def _eleven_tts_stream(self, text):
+        self.calls.append(("elevenlabs-stream", text))
+        for word in text.split():
+            yield word.encode()
+
+    def _gtts_chunk(self, text, language):
+        self.calls.append(("gtts", text))
+        return b"gtts:" + text.encode()
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestSynthesisCache:
+    def test_repeat_synthesis_makes_no_engine_call(self, tmp_path):
+        voice = CountingVoice(tmp_path)
+
+        async def scenario():
+            first = await voice.synthesize("No offers found", "en")
+            second = await voice.synthesize("No offers found", "en")
+            return first, second
+
+        assert asyncio.run(scenario()) == (b"gtts:No offers found",) * 2
+        assert voice.calls == [("gtts", "No offers found")]
+
+    def test_engine_is_part_of_the_key(self, tmp_path):
+        voice = CountingVoice(tmp_path)
+        gtts_key = voice._audio_key("Welcome!", "en")
+        voice.eleven_key = "key"
+        assert voice._audio_key("Welcome!", "en") != gtts_key
+        assert asyncio.run(voice.synthesize("Welcome!", "en")) == b"eleven:Welcome!"
+
+    def test_disk_tier_is_shared_across_instances(self, tmp_path):
+        asyncio.run(CountingVoice(tmp_path).synthesize("Welcome!", "en"))
+        restarted = CountingVoice(tmp_path)
+        assert asyncio.run(restarted.synthesize("Welcome!", "en")) == b"gtts:Welcome!"
+        assert restarted.calls == []
+
+    def test_disk_write_failure_still_returns_the_audio(self, tmp_path):
+        voice = CountingVoice(tmp_path)
+
+        def full_disk(key, data):
+            raise OSError(28, "No space left on device")
+
+        voice.audio_disk_cache.set = full_disk
+        assert asyncio.run(voice.synthesize("Welcome!", "en")) == b"gtts:Welcome!"
+
+
+class TestStreamingSynthesis:
+    def test_chunks_are_relayed_then_cached(self, tmp_path):
+        voice = CountingVoice(tmp_path, eleven_key="key")
+
+        async def scenario():
+            streamed = await collect(voice.stream_synthesize("two offers found", "en"))
+            replayed = await collect(voice.stream_synthesize("two offers found", "en"))
+            return streamed, replayed
+
+        streamed, replayed = asyncio.run(scenario())
+        assert streamed == [b"two", b"offers", b"found"]
+        assert replayed == [b"twooffersfound"]
+        assert voice.calls == [("elevenlabs-stream", "two offers found")]
+
+    def test_long_clips_are_not_cached(self, tmp_path):
+        voice = CountingVoice(tmp_path, eleven_key="key")
+        voice.stream_cache_max_bytes = 4
+
+        async def scenario():
+            for _ in range(2):
+                await collect(voice.stream_synthesize("two offers found", "en"))
+
+        asyncio.run(scenario())
+        assert len(voice.calls) == 2
+
+    def test_gtts_is_sent_as_one_chunk(self, tmp_path):
+        voice = CountingVoice(tmp_path)
+        chunks = asyncio.run(collect(voice.stream_synthesize("Welcome!", "hi")))
+        assert chunks == [b"gtts:Welcome!"]
+
+
+class TestElevenLabsClient:
+    def test_requests_share_the_pooled_client(self, tmp_path):
+        seen = []
+
+        def handler(request):
+            seen.append((request.url.path, request.headers["xi-api-key"]))
+            return httpx.Response(200, content=b"mp3")
+
+        voice = VoiceHandler(
+            transport=httpx.MockTransport(handler), cache_dir=str(tmp_path)
+        )
+        voice.eleven_key = "key"
+
+        async def scenario():
+            client = voice.http_client
+            audio = await voice._eleven_tts("Welcome!")
+            chunks = await collect(voice._eleven_tts_stream("Welcome!"))
+            await voice.aclose()
+            return audio, chunks, client
+
+        audio, chunks, client = asyncio.run(scenario())
+        assert audio == b"mp3" and b"".join(chunks) == b"mp3"
+        assert voice.http_client is client and client.is_closed
+        assert [path for path, _ in seen] == [
+            "/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM",
+            "/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM/stream",
+        ]
+        assert {key for _, key in seen} == {"key"}
+
+
+class TestSentenceChunking:
+    def test_first_sentence_is_its_own_chunk(self):
+        text = "Hello! Here are 3 offers. 10% off shoes.\nValid till Friday?"
+        assert split_sentences(text, max_chars=40) == [
+            "Hello!",
+            "Here are 3 offers. 10% off shoes.",
+            "Valid till Friday?",
+        ]
+
+    def test_chunks_are_synthesized_in_parallel_and_kept_in_order(self, tmp_path):
+        voice = CountingVoice(tmp_path)
+        voice.gtts_chunk_chars = 10
+        started = threading.Barrier(3, timeout=5)
+
+        def chunk(text, language):
+            # Deadlocks unless all three sentences run at once
+            started.wait()
+            return text.encode()
+
+        voice._gtts_chunk = chunk
+        text = "One deal. Two deals. Three deals."
+        chunks = asyncio.run(collect(voice.stream_synthesize(text, "hi")))
+        assert chunks == [b"One deal.", b"Two deals.", b"Three deals."]
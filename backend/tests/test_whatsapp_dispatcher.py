@@ -0,0 +1,219 @@
+"""
+Test suite for background WhatsApp reply delivery
+Twilio's REST API is replaced by a stub ASGI endpoint served through httpx
+"""
+
+import asyncio
+import base64
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+
+from whatsapp_dispatcher import ERROR_REPLY, TwilioSender, WhatsAppDispatcher
+
+
+def make_twilio_stub(statuses=()):
+    """Stub Messages endpoint; answers with `statuses` first, then 201"""
+    app = FastAPI()
+    app.state.messages = []
+    app.state.auth = []
+    pending = list(statuses)
+
+    @app.post("/2010-04-01/Accounts/{sid}/Messages.json")
+    async def messages(sid: str, request: Request):
+        form = await request.form()
+        app.state.auth.append(request.headers["authorization"])
+        status = pending.pop(0) if pending else 201
+        if status == 201:
+            app.state.messages.append(dict(form))
+        return Response(status_code=status)
+
+    return app
+
+
+def make_sender(stub, **kwargs):
+    kwargs.setdefault("transport", httpx.ASGITransport(app=stub))
+    return TwilioSender(
+        account_sid="AC123",
+        auth_token="secret",
+        api_base="http://twilio.test",
+        **kwargs,
+    )
+
+
+def job(body):
+    return {"from": "whatsapp:+911234", "to": "whatsapp:+14155238886", "body": body}
+
+
+async def upper(body):
+    return body.upper()
+
+
+class TestWhatsAppDispatcher:
+    def test_reply_is_sent_back_to_the_user(self):
+        stub = make_twilio_stub()
+
+        async def scenario():
+            dispatcher = WhatsAppDispatcher(upper, sender=make_sender(stub), workers=2)
+            dispatcher.start()
+            assert dispatcher.enqueue(job("gold offers in pune"))
+            await dispatcher.stop()
+            return dispatcher.stats()
+
+        assert asyncio.run(scenario())["sent"] == 1
+        assert stub.state.messages == [
+            {
+                "From": "whatsapp:+14155238886",
+                "To": "whatsapp:+911234",
+                "Body": "GOLD OFFERS IN PUNE",
+            }
+        ]
+        expected = "Basic " + base64.b64encode(b"AC123:secret").decode()
+        assert stub.state.auth == [expected]
+
+    def test_workers_bound_concurrent_replies(self):
+        stub = make_twilio_stub()
+        active, peak = 0, 0
+
+        async def slow_reply(body):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return body
+
+        async def scenario():
+            dispatcher = WhatsAppDispatcher(
+                slow_reply, sender=make_sender(stub), workers=3
+            )
+            dispatcher.start()
+            for i in range(12):
+                dispatcher.enqueue(job(f"message {i}"))
+            await dispatcher.stop()
+
+        asyncio.run(scenario())
+        assert peak == 3
+        assert len(stub.state.messages) == 12
+
+    def test_full_queue_rejects(self):
+        async def scenario():
+            dispatcher = WhatsAppDispatcher(
+                upper, sender=make_sender(make_twilio_stub()), max_queue=1
+            )
+            # Workers not started, so nothing drains the queue
+            results = [dispatcher.enqueue(job("a")), dispatcher.enqueue(job("b"))]
+            await dispatcher.sender.aclose()
+            return results, dispatcher.stats()["rejected"]
+
+        assert asyncio.run(scenario()) == ([True, False], 1)
+
+    def test_failed_reply_sends_an_apology(self):
+        stub = make_twilio_stub()
+
+        async def broken(body):
+            raise RuntimeError("LLM down")
+
+        async def scenario():
+            dispatcher = WhatsAppDispatcher(broken, sender=make_sender(stub))
+            dispatcher.start()
+            dispatcher.enqueue(job("gold offers"))
+            await dispatcher.stop()
+
+        asyncio.run(scenario())
+        assert [m["Body"] for m in stub.state.messages] == [ERROR_REPLY]
+
+
+class TestTwilioSender:
+    def test_throttled_send_is_retried(self, monkeypatch):
+        stub = make_twilio_stub(statuses=[429, 429])
+        monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+
+        async def scenario():
+            sender = make_sender(stub, retries=2)
+            await sender.send("whatsapp:+1", "whatsapp:+2", "hi")
+            await sender.aclose()
+
+        asyncio.run(scenario())
+        assert len(stub.state.messages) == 1
+
+    def test_client_errors_are_not_retried(self):
+        stub = make_twilio_stub(statuses=[400])
+
+        async def scenario():
+            sender = make_sender(stub, retries=2)
+            try:
+                await sender.send("whatsapp:+1", "whatsapp:+2", "hi")
+            except httpx.HTTPStatusError as e:
+                return e.response.status_code
+            finally:
+                await sender.aclose()
+
+        assert asyncio.run(scenario()) == 400
+        assert len(stub.state.auth) == 1
+
+    def test_server_errors_are_not_retried(self):
+        # Twilio may already have queued the message
+        stub = make_twilio_stub(statuses=[503])
+
+        async def scenario():
+            sender = make_sender(stub, retries=2)
+            try:
+                await sender.send("whatsapp:+1", "whatsapp:+2", "hi")
+            except httpx.HTTPStatusError as e:
+                return e.response.status_code
+            finally:
+                await sender.aclose()
+
+        assert asyncio.run(scenario()) == 503
+        assert len(stub.state.auth) == 1
+
+    def test_connection_failures_are_retried(self, monkeypatch):
+        stub = make_twilio_stub()
+        transport = FlakyTransport(stub, [httpx.ConnectError, httpx.ConnectTimeout])
+        monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+
+        async def scenario():
+            sender = make_sender(stub, retries=2, transport=transport)
+            await sender.send("whatsapp:+1", "whatsapp:+2", "hi")
+            await sender.aclose()
+
+        asyncio.run(scenario())
+        assert transport.attempts == 3
+        assert len(stub.state.messages) == 1
+
+    def test_read_timeouts_are_not_retried(self, monkeypatch):
+        stub = make_twilio_stub()
+        transport = FlakyTransport(stub, [httpx.ReadTimeout])
+        monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+
+        async def scenario():
+            sender = make_sender(stub, retries=2, transport=transport)
+            try:
+                await sender.send("whatsapp:+1", "whatsapp:+2", "hi")
+            finally:
+                await sender.aclose()
+
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(scenario())
+        assert transport.attempts == 1
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """Raises `errors` in turn, then hands requests to the stub"""
+
+    def __init__(self, stub, errors):
+        self.inner = httpx.ASGITransport(app=stub)
+        self.errors = list(errors)
+        self.attempts = 0
+
+    async def handle_async_request(self, request):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)("simulated", request=request)
+        return await self.inner.handle_async_request(request)
+
+
+async def _no_sleep(delay):
+    return None
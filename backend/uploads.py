@@ -0,0 +1,126 @@
+"""
+Upload Handling for Know Your Local Offers
+Per-endpoint request body limits and memory-mapped access to large spooled uploads
+"""
+
+import io
+import os
+import mmap
+from contextlib import contextmanager
+from typing import Dict, Iterator, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+MB = 1024 * 1024
+
+
+def upload_limits() -> Dict[str, int]:
+    """Maximum request body size per path, tunable through the environment"""
+    ocr = int(os.getenv("OCR_MAX_UPLOAD_MB", "20")) * MB
+    voice = int(os.getenv("VOICE_MAX_UPLOAD_MB", "25")) * MB
+    return {
+        "/ocr": ocr,
+        "/ocr/batch": int(os.getenv("OCR_BATCH_MAX_UPLOAD_MB", "200")) * MB,
+        "/voice/transcribe": voice,
+        "/multimodal": int(os.getenv("MULTIMODAL_MAX_UPLOAD_MB", "0")) * MB
+        or ocr + voice,
+    }
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=413, detail=f"Upload exceeds the {limit // MB} MB limit"
+        )
+
+
+class UploadLimitMiddleware:
+    """Reject oversized request bodies before they are buffered.
+
+    A declared Content-Length over the limit is refused without reading the
+    body; chunked bodies are counted as they arrive and cut off as soon as
+    they cross it, so the multipart parser never spools more than the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            await self._reject(limit, scope, receive, send)
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise UploadTooLarge(limit)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except UploadTooLarge:
+            # Normally turned into a 413 by FastAPI; this covers raw body reads
+            if started:
+                raise
+            await self._reject(limit, scope, receive, send)
+
+    async def _reject(self, limit, scope, receive, send):
+        error = UploadTooLarge(limit)
+        response = JSONResponse({"detail": error.detail}, status_code=413)
+        await response(scope, receive, send)
+
+
+# Starlette keeps multipart files up to this size in memory
+SPOOL_MAX_BYTES = MB
+
+
+@contextmanager
+def upload_buffer(
+    upload: UploadFile,
+) -> Iterator[Union[bytes, memoryview, mmap.mmap]]:
+    """Read-only view of an upload's contents, mapped rather than copied when large.
+
+    Uploads within the in-memory spool size are read once and the bytes are
+    handed over as they are; larger ones are rolled over to their temporary
+    file (a no-op once they are there) and memory-mapped. A plain BytesIO is
+    viewed in place. The view is only valid inside the `with` block.
+    """
+    spooled = upload.file
+    position = spooled.tell()
+    size = spooled.seek(0, io.SEEK_END)
+    if isinstance(spooled, io.BytesIO):
+        view = spooled.getbuffer()
+    elif size <= SPOOL_MAX_BYTES:
+        spooled.seek(0)
+        view = spooled.read()
+    else:
+        spooled.rollover()
+        spooled.flush()
+        view = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        if isinstance(view, mmap.mmap):
+            view.close()
+        elif isinstance(view, memoryview):
+            view.release()
+        spooled.seek(position)
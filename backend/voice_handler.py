@@ -4,39 +4,179 @@ Handles speech-to-text and text-to-speech conversions
 """
 import os
 import io
-from openai import OpenAI
+import re
+import json
+import asyncio
+import hashlib
+import tempfile
+import importlib.util
+from openai import AsyncOpenAI
 import httpx
 from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple, Union
+from cache import TTLCache, DiskCache, MISSING
+from metrics import timed
+
+ELEVEN_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+ELEVEN_MODEL_ID = "eleven_monolingual_v1"
+ELEVEN_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.5}
+GTTS_LANGUAGES = {"en": "en"}
+
+SENTENCE_END = re.compile(r"(?<=[.!?\u0964])\s+|\n+")
+
+def split_sentences(text: str, max_chars: int = 100) -> List[str]:
+    """Split text at sentence boundaries into chunks of up to max_chars.
+
+    The first sentence is always its own chunk so its audio is ready first;
+    later sentences are merged while they fit.
+    """
+    sentences = [s.strip() for s in SENTENCE_END.split(text) if s.strip()]
+    chunks = []
+    for sentence in sentences:
+        if len(chunks) > 1 and len(chunks[-1]) + 1 + len(sentence) <= max_chars:
+            chunks[-1] += " " + sentence
+        else:
+            chunks.append(sentence)
+    return chunks or [text]
 
 class VoiceHandler:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 cache_dir: Optional[str] = None):
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.eleven_key = os.getenv("ELEVENLABS_API_KEY")
+        max_connections = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "10"))
+        # One keep-alive pool for every TTS call, closed by the app lifespan
+        self.http_client = httpx.AsyncClient(
+            base_url=os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io"),
+            http2=transport is None and importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(float(os.getenv("ELEVENLABS_TIMEOUT", "30")), connect=5.0),
+            transport=transport,
+        )
         # path to Google creds set in GOOGLE_APPLICATION_CREDENTIALS env   
+        # Synthesized audio: small hot tier in memory in front of a bounded disk store
+        self.audio_cache = TTLCache(
+            max_size=int(os.getenv("TTS_CACHE_HOT_SIZE", "64")),
+            default_ttl=float(os.getenv("TTS_CACHE_TTL", "86400")),
+        )
+        self.audio_disk_cache = DiskCache(
+            cache_dir or os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "klo-tts-cache")),
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024,
+        )
+        self.hot_item_max_bytes = int(os.getenv("TTS_CACHE_HOT_ITEM_KB", "512")) * 1024
+        # Streamed clips longer than this are relayed but not cached
+        self.stream_cache_max_bytes = int(os.getenv("TTS_CACHE_STREAM_MAX_KB", "2048")) * 1024
+        # gTTS is blocking; sentences are synthesized in parallel on these threads
+        self.gtts_chunk_chars = int(os.getenv("GTTS_CHUNK_CHARS", "100"))
+        self.gtts_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("GTTS_WORKERS", "4")),
+            thread_name_prefix="gtts",
+        )
+
+    async def transcribe(self, audio: Union[bytes, BinaryIO]) -> str:
+        text, _ = await self.transcribe_result(audio)
+        return text
 
-    async def transcribe(self, audio_bytes: bytes) -> str:
+    @timed("voice.transcribe")
+    async def transcribe_result(self, audio: Union[bytes, BinaryIO]) -> Tuple[str, bool]:
+        """Transcribe audio; returns (text, succeeded)"""
         try:
-            file_obj = io.BytesIO(audio_bytes)
-            file_obj.name = "audio.wav"
+            # File objects (e.g. a spooled upload) are streamed without a copy
+            file_obj = io.BytesIO(audio) if isinstance(audio, bytes) else audio
+            file_obj.seek(0)
             
-            response = self.client.audio.transcriptions.create(
+            response = await self.client.audio.transcriptions.create(
                 model="whisper-1",
-                file=file_obj,
+                file=("audio.wav", file_obj),
                 language="en"
             )
-            return response.text
+            return response.text, True
         except Exception as e:
             print(f"[VoiceHandler:transcribe] {e}")
-            return "Could not transcribe audio."
+            return "Could not transcribe audio.", False
 
+    @timed("voice.synthesize")
     async def synthesize(self, text: str, language: str) -> bytes:
+        key = self._audio_key(text, language)
+        audio = await self._cached_audio(key)
+        if audio is not None:
+            return audio
+
         # English via ElevenLabs, else gTTS
-        if language == "en" and self.eleven_key:
-            return await self._eleven_tts(text)
-        return await self._gtts_tts(text, language)
+        if self._engine(language) == "elevenlabs":
+            audio = await self._eleven_tts(text)
+        else:
+            audio = await self._gtts_tts(text, language)
+        await self._store_audio(key, audio)
+        return audio
 
-    async def _eleven_tts(self, text: str) -> bytes:
-        url = "https://api.elevenlabs.io/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM"
+    @timed("voice.stream_synthesize")
+    async def stream_synthesize(self, text: str, language: str) -> AsyncIterator[bytes]:
+        """Yield audio chunks as the engine produces them"""
+        key = self._audio_key(text, language)
+        audio = await self._cached_audio(key)
+        if audio is not None:
+            yield audio
+            return
+
+        if self._engine(language) == "elevenlabs":
+            source = self._eleven_tts_stream(text)
+        else:
+            source = self._gtts_stream(text, language)
+
+        # Keep a copy for the cache only while the clip stays small
+        chunks, size = [], 0
+        async for chunk in source:
+            if chunks is not None:
+                size += len(chunk)
+                if size <= self.stream_cache_max_bytes:
+                    chunks.append(chunk)
+                else:
+                    chunks = None
+            yield chunk
+        if chunks:
+            await self._store_audio(key, b"".join(chunks))
+
+    def _engine(self, language: str) -> str:
+        return "elevenlabs" if language == "en" and self.eleven_key else "gtts"
+
+    def _audio_key(self, text: str, language: str) -> str:
+        """Content address for (text hash, language, voice, engine)"""
+        engine = self._engine(language)
+        if engine == "elevenlabs":
+            voice = [ELEVEN_VOICE_ID, ELEVEN_MODEL_ID, ELEVEN_VOICE_SETTINGS]
+        else:
+            voice = [GTTS_LANGUAGES.get(language, "en")]
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        raw = json.dumps([text_hash, language, voice, engine], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _cached_audio(self, key: str):
+        audio = self.audio_cache.get(key)
+        if audio is not MISSING:
+            return audio
+        audio = await asyncio.to_thread(self.audio_disk_cache.get, key)
+        if audio is not None and len(audio) <= self.hot_item_max_bytes:
+            self.audio_cache.set(key, audio)
+        return audio
+
+    async def _store_audio(self, key: str, audio: bytes) -> None:
+        if not audio:
+            return
+        if len(audio) <= self.hot_item_max_bytes:
+            self.audio_cache.set(key, audio)
+        try:
+            await asyncio.to_thread(self.audio_disk_cache.set, key, audio)
+        except OSError as e:
+            # The clip was synthesized fine; only the cache copy is lost
+            print(f"[VoiceHandler] disk cache write failed: {e}")
+
+    def _eleven_request(self, text: str):
         headers = {
             "Accept":        "audio/mpeg",
             "Content-Type":  "application/json",
@@ -44,18 +184,57 @@ class VoiceHandler:
         }
         json_data = {
             "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {"stability":0.5, "similarity_boost":0.5}
+            "model_id": ELEVEN_MODEL_ID,
+            "voice_settings": ELEVEN_VOICE_SETTINGS
         }
-        async with httpx.AsyncClient() as client:
-            r = await client.post(url, json=json_data, headers=headers)
+        return headers, json_data
+
+    @timed("elevenlabs.synthesize")
+    async def _eleven_tts(self, text: str) -> bytes:
+        url = f"/v1/text-to-speech/{ELEVEN_VOICE_ID}"
+        headers, json_data = self._eleven_request(text)
+        r = await self.http_client.post(url, json=json_data, headers=headers)
         r.raise_for_status()
         return r.content
 
+    @timed("elevenlabs.stream")
+    async def _eleven_tts_stream(self, text: str) -> AsyncIterator[bytes]:
+        """Relay ElevenLabs' streaming endpoint chunk by chunk"""
+        url = f"/v1/text-to-speech/{ELEVEN_VOICE_ID}/stream"
+        headers, json_data = self._eleven_request(text)
+        async with self.http_client.stream("POST", url, json=json_data, headers=headers) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                yield chunk
+
     async def _gtts_tts(self, text: str, language: str) -> bytes:
-        lang_map = {"en":"en"}
-        tts   = gTTS(text=text, lang=lang_map.get(language, "en"), slow=False)
+        return b"".join([chunk async for chunk in self._gtts_stream(text, language)])
+
+    async def _gtts_stream(self, text: str, language: str) -> AsyncIterator[bytes]:
+        """Synthesize sentences concurrently and yield their MP3s in order"""
+        loop = asyncio.get_running_loop()
+        jobs = [
+            loop.run_in_executor(self.gtts_pool, self._gtts_chunk, sentence, language)
+            for sentence in split_sentences(text, self.gtts_chunk_chars)
+        ]
+        try:
+            for job in jobs:
+                # MP3 frames are self-contained, so the parts concatenate cleanly
+                yield await job
+        finally:
+            for job in jobs:
+                job.cancel()
+
+    @timed("gtts.synthesize_chunk")
+    def _gtts_chunk(self, text: str, language: str) -> bytes:
+        """Runs on a gTTS pool thread"""
+        tts   = gTTS(text=text, lang=GTTS_LANGUAGES.get(language, "en"), slow=False)
         buf   = io.BytesIO()
         tts.write_to_fp(buf)
-        buf.seek(0)
-        return buf.read()
\ No newline at end of file
+        return buf.getvalue()
+
+    async def aclose(self) -> None:
+        """Release pooled TTS connections"""
+        await self.http_client.aclose()
+        await self.client.close()
+        self.gtts_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,180 @@
+"""
+WhatsApp Dispatcher for Know Your Local Offers
+Background reply delivery: the Twilio webhook enqueues messages, a worker pool answers them via the REST API
+"""
+
+import os
+import asyncio
+import importlib.util
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from metrics import timed
+
+ERROR_REPLY = "Sorry, there was a technical issue. Please try again."
+BUSY_REPLY = "We're receiving a lot of messages right now. Please try again in a minute."
+
+
+# The request never left this process, so Twilio cannot have seen it
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class TwilioSender:
+    """Sends WhatsApp messages through Twilio's Messages REST API"""
+
+    def __init__(
+        self,
+        account_sid: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        api_base: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.account_sid = account_sid or os.getenv("TWILIO_ACCOUNT_SID") or ""
+        auth_token = auth_token or os.getenv("TWILIO_AUTH_TOKEN") or ""
+        max_connections = max_connections or int(
+            os.getenv("TWILIO_MAX_CONNECTIONS", "10")
+        )
+        self.retries = (
+            retries
+            if retries is not None
+            else int(os.getenv("TWILIO_SEND_RETRIES", "2"))
+        )
+        self.client = httpx.AsyncClient(
+            base_url=api_base or os.getenv("TWILIO_API_BASE", "https://api.twilio.com"),
+            auth=(self.account_sid, auth_token),
+            http2=transport is None and importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(
+                timeout or float(os.getenv("TWILIO_TIMEOUT", "10")), connect=5.0
+            ),
+            transport=transport,
+        )
+
+    @timed("twilio.send")
+    async def send(self, from_number: str, to_number: str, body: str) -> None:
+        """POST one message; retries with backoff only when Twilio cannot have queued it"""
+        url = f"/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        data = {"From": from_number, "To": to_number, "Body": body}
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = await self.client.post(url, data=data)
+            except UNSENT_ERRORS as e:
+                if last:
+                    raise
+                print(f"[TwilioSender] send attempt {attempt + 1} failed: {e!r}")
+            else:
+                # A 5xx or read timeout may come after the message was queued,
+                # so only throttling is retried; anything else would risk a
+                # duplicate WhatsApp message
+                if response.status_code != 429 or last:
+                    response.raise_for_status()
+                    return
+            await asyncio.sleep(0.5 * 2**attempt)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class WhatsAppDispatcher:
+    """In-process job queue drained by a fixed pool of reply workers.
+
+    The worker count is also the cap on concurrent reply generation (and so
+    on LLM calls made for WhatsApp), however fast messages arrive. The queue
+    is bounded; `enqueue` returns False when it is full so the webhook can
+    answer straight away instead of piling up work.
+    """
+
+    def __init__(
+        self,
+        reply: Callable[[str], Awaitable[str]],
+        sender: Optional[TwilioSender] = None,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        reply_timeout: Optional[float] = None,
+    ):
+        self.reply = reply
+        self.sender = sender or TwilioSender()
+        self.workers = workers or int(os.getenv("WHATSAPP_WORKERS", "8"))
+        self.reply_timeout = reply_timeout or float(
+            os.getenv("WHATSAPP_REPLY_TIMEOUT", "60")
+        )
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_queue or int(os.getenv("WHATSAPP_QUEUE_SIZE", "1000"))
+        )
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Spawn the workers; call from inside the running event loop"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    def enqueue(self, job: Dict[str, str]) -> bool:
+        """Queue {"from", "to", "body"} from a webhook; False when the queue is full"""
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            print("[WhatsAppDispatcher] queue full, message not accepted")
+            return False
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Give queued replies a chance to go out, then stop the workers"""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(
+                f"[WhatsAppDispatcher] {self.queue.qsize()} replies dropped at shutdown"
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.sender.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._handle(job)
+            finally:
+                self.queue.task_done()
+
+    @timed("whatsapp.reply_job")
+    async def _handle(self, job: Dict[str, str]) -> None:
+        try:
+            text = await asyncio.wait_for(
+                self.reply(job["body"]), timeout=self.reply_timeout
+            )
+        except Exception as e:
+            print(f"[WhatsAppDispatcher] reply error: {e!r}")
+            text = ERROR_REPLY
+        try:
+            # Reply from the number the user wrote to
+            await self.sender.send(job["to"], job["from"], text)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"[WhatsAppDispatcher] send error: {e}")
@@ -0,0 +1,53 @@
+-- Offer Catalog
+-- Distinct cities and categories with offer counts, maintained on write so
+-- /api/cities and /api/categories read O(distinct values) rows instead of
+-- scanning the whole offers table.
+
+CREATE TABLE IF NOT EXISTS offer_catalog (
+    kind TEXT NOT NULL CHECK (kind IN ('city', 'category')),
+    value TEXT NOT NULL,
+    offer_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, value)
+);
+
+CREATE OR REPLACE FUNCTION offer_catalog_bump(p_kind TEXT, p_value TEXT, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p_value IS NULL OR p_value = '' THEN
+        RETURN;
+    END IF;
+    INSERT INTO offer_catalog (kind, value, offer_count)
+    VALUES (p_kind, p_value, GREATEST(p_delta, 0))
+    ON CONFLICT (kind, value)
+    DO UPDATE SET offer_count = offer_catalog.offer_count + p_delta;
+    DELETE FROM offer_catalog
+    WHERE kind = p_kind AND value = p_value AND offer_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_catalog_sync()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM offer_catalog_bump('city', OLD.city::TEXT, -1);
+        PERFORM offer_catalog_bump('category', OLD.category::TEXT, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM offer_catalog_bump('city', NEW.city::TEXT, 1);
+        PERFORM offer_catalog_bump('category', NEW.category::TEXT, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS offers_catalog_sync ON offers;
+CREATE TRIGGER offers_catalog_sync
+    AFTER INSERT OR DELETE OR UPDATE OF city, category ON offers
+    FOR EACH ROW EXECUTE FUNCTION offer_catalog_sync();
+
+-- Backfill from the existing rows
+TRUNCATE offer_catalog;
+INSERT INTO offer_catalog (kind, value, offer_count)
+SELECT 'city', city::TEXT, COUNT(*) FROM offers WHERE city IS NOT NULL AND city::TEXT <> '' GROUP BY city
+UNION ALL
+SELECT 'category', category::TEXT, COUNT(*) FROM offers WHERE category IS NOT NULL AND category::TEXT <> '' GROUP BY category;
@@ -0,0 +1,57 @@
+-- Offer Search
+-- Trigram and full-text indexes plus a ranked search function, so
+-- DatabaseService.search_offers uses indexes instead of sequential
+-- '%query%' scans over offer_text, store_name and category.
+
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+-- Weighted search document: store name first, then offer text, then category
+CREATE OR REPLACE FUNCTION offers_search_document(store_name TEXT, offer_text TEXT, category TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('english', COALESCE(store_name, '')), 'A')
+        || setweight(to_tsvector('english', COALESCE(offer_text, '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(category, '')), 'C');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS idx_offers_search_document
+    ON offers USING GIN (offers_search_document(store_name::TEXT, offer_text::TEXT, category::TEXT));
+
+-- Trigram indexes back the ILIKE '%...%' filters (substring and city matches)
+CREATE INDEX IF NOT EXISTS idx_offers_offer_text_trgm ON offers USING GIN ((offer_text::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_offers_store_name_trgm ON offers USING GIN ((store_name::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_offers_category_trgm ON offers USING GIN ((category::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_offers_city_trgm ON offers USING GIN ((city::TEXT) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_offers_valid_till ON offers (valid_till);
+
+-- Ranked search. Any query term may match (terms are OR-ed), exact
+-- substrings still match through the trigram indexes, and results are
+-- ordered by full-text rank plus trigram similarity, then by validity.
+CREATE OR REPLACE FUNCTION search_offers(
+    search_query TEXT,
+    city_filter TEXT DEFAULT NULL,
+    category_filter TEXT DEFAULT NULL,
+    max_results INTEGER DEFAULT 10
+)
+RETURNS SETOF offers AS $$
+    WITH q AS (
+        SELECT
+            NULLIF(replace(plainto_tsquery('english', search_query)::TEXT, '&', '|'), '')::tsquery AS tsq,
+            '%' || lower(trim(search_query)) || '%' AS pattern
+    )
+    SELECT o.*
+    FROM offers o, q
+    WHERE (city_filter IS NULL OR o.city::TEXT ILIKE '%' || city_filter || '%')
+      AND (category_filter IS NULL OR o.category::TEXT = category_filter)
+      AND (
+            (q.tsq IS NOT NULL
+             AND offers_search_document(o.store_name::TEXT, o.offer_text::TEXT, o.category::TEXT) @@ q.tsq)
+         OR o.offer_text::TEXT ILIKE q.pattern
+         OR o.store_name::TEXT ILIKE q.pattern
+         OR o.category::TEXT ILIKE q.pattern
+      )
+    ORDER BY
+        COALESCE(ts_rank_cd(offers_search_document(o.store_name::TEXT, o.offer_text::TEXT, o.category::TEXT), q.tsq), 0)
+            + similarity(o.offer_text::TEXT, search_query) DESC,
+        o.valid_till ASC
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,75 @@
+-- Ranked Offers
+-- One-round-trip retrieval for chat: evaluates the query, city, category
+-- and trending tiers server-side and returns the best non-empty tier.
+-- Every row carries the tier it matched and a score where
+-- query > city > category > trending.
+
+CREATE OR REPLACE FUNCTION ranked_offers(
+    search_query TEXT DEFAULT '',
+    city_filter TEXT DEFAULT NULL,
+    category_filter TEXT DEFAULT NULL,
+    max_results INTEGER DEFAULT 5,
+    trending_limit INTEGER DEFAULT 3
+)
+RETURNS TABLE (offer JSONB, match_tier TEXT, match_score REAL) AS $$
+BEGIN
+    -- Tier 1: the user's query (or just the extracted filters for non-English text)
+    IF COALESCE(trim(search_query), '') <> '' THEN
+        RETURN QUERY
+            SELECT to_jsonb(s), 'query'::TEXT, (4 + 1.0 / (row_number() OVER () + 1))::REAL
+            FROM search_offers(search_query, city_filter, category_filter, max_results) s;
+    ELSE
+        RETURN QUERY
+            SELECT to_jsonb(o), 'query'::TEXT, (4 + 1.0 / (row_number() OVER (ORDER BY o.valid_till) + 1))::REAL
+            FROM (
+                SELECT * FROM offers f
+                WHERE (city_filter IS NULL OR f.city::TEXT ILIKE '%' || city_filter || '%')
+                  AND (category_filter IS NULL OR f.category::TEXT = category_filter)
+                ORDER BY f.valid_till ASC
+                LIMIT max_results
+            ) o;
+    END IF;
+    IF FOUND THEN
+        RETURN;
+    END IF;
+
+    -- Tier 2: any offer in the city
+    IF city_filter IS NOT NULL THEN
+        RETURN QUERY
+            SELECT to_jsonb(o), 'city'::TEXT, (3 + 1.0 / (row_number() OVER (ORDER BY o.valid_till) + 1))::REAL
+            FROM (
+                SELECT * FROM offers f
+                WHERE f.city::TEXT ILIKE '%' || city_filter || '%'
+                ORDER BY f.valid_till ASC
+                LIMIT max_results
+            ) o;
+        IF FOUND THEN
+            RETURN;
+        END IF;
+    END IF;
+
+    -- Tier 3: any offer in the category
+    IF category_filter IS NOT NULL THEN
+        RETURN QUERY
+            SELECT to_jsonb(o), 'category'::TEXT, (2 + 1.0 / (row_number() OVER (ORDER BY o.valid_till) + 1))::REAL
+            FROM (
+                SELECT * FROM offers f
+                WHERE f.category::TEXT = category_filter
+                ORDER BY f.valid_till ASC
+                LIMIT max_results
+            ) o;
+        IF FOUND THEN
+            RETURN;
+        END IF;
+    END IF;
+
+    -- Tier 4: trending offers
+    RETURN QUERY
+        SELECT to_jsonb(o), 'trending'::TEXT, (1 + 1.0 / (row_number() OVER (ORDER BY o.valid_till) + 1))::REAL
+        FROM (
+            SELECT * FROM offers f
+            ORDER BY f.valid_till ASC
+            LIMIT trending_limit
+        ) o;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,24 @@
+-- Place Aliases
+-- Extra spellings for the chat gazetteer: localities that belong to a city,
+-- old or alternate city names, and words that imply a category. Cities and
+-- categories themselves come from offer_catalog and business_places; rows here
+-- only add ways of referring to them. Read by the backend on each
+-- gazetteer refresh, so new entries take effect without a deploy.
+
+CREATE TABLE IF NOT EXISTS place_aliases (
+    alias TEXT PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('city', 'category')),
+    value TEXT NOT NULL
+);
+
+INSERT INTO place_aliases (alias, kind, value) VALUES
+    ('bombay', 'city', 'Mumbai'),
+    ('poona', 'city', 'Pune'),
+    ('rajarampuri', 'city', 'Kolhapur'),
+    ('shahupuri', 'city', 'Kolhapur'),
+    ('mahadwar road', 'city', 'Kolhapur'),
+    ('vishrambag', 'city', 'Sangli'),
+    ('miraj', 'city', 'Sangli'),
+    ('necklace', 'category', 'jewellery'),
+    ('mangalsutra', 'category', 'jewellery')
+ON CONFLICT (alias) DO NOTHING;
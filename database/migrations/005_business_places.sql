@@ -0,0 +1,10 @@
+-- Business Places
+-- Distinct (city, category) pairs of active businesses, for the chat
+-- gazetteer. Places with businesses but no offers yet are still recognised
+-- in messages; the view returns one row per pair, so a gazetteer refresh
+-- reads O(distinct places) rows instead of the whole businesses table.
+
+CREATE OR REPLACE VIEW business_places AS
+SELECT DISTINCT city::TEXT AS city, category::TEXT AS category
+FROM businesses
+WHERE is_active;
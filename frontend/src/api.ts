@@ -38,6 +38,61 @@ export async function sendMessage(
   return data.response;
 }
 
+export async function streamMessage(
+  text: string,
+  language: string,
+  onDelta: (delta: string) => void
+): Promise<string> {
+  const res = await fetch("http://localhost:8000/api/chat/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ message: text, language }),
+  });
+  if (!res.ok || !res.body) {
+    const err = await res.text();
+    throw new Error(err || "Network error");
+  }
+
+  // Parse Server-Sent Events: blank-line separated blocks of "event:"/"data:" lines
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let full = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      const lines = block.split("\n");
+      const isDone = lines.some((line) => line === "event: done");
+      const isError = lines.some((line) => line === "event: error");
+      const data = lines
+        .filter((line) => line.startsWith("data: "))
+        .map((line) => line.slice(6))
+        .join("\n");
+      if (isDone) return full;
+      if (isError) {
+        const { error } = JSON.parse(data) as { error: string };
+        throw new Error(error);
+      }
+      if (!data) continue;
+
+      const { delta } = JSON.parse(data) as { delta: string };
+      full += delta;
+      onDelta(delta);
+    }
+  }
+
+  return full;
+}
+
 export async function transcribeAudio(audioBlob: Blob): Promise<string> {
   const formData = new FormData();
   formData.append('file', audioBlob, 'recording.wav');